@@ -44,8 +44,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.RequestMetricsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Before sessions, so a session saved on the way out counts as a write
+    "core.replicas.ReplicaPinningMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,13 +82,69 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Run on every new SQLite connection. WAL lets readers carry on while one
+# process writes; synchronous=NORMAL is safe with WAL (a power cut can lose the
+# last commits, never corrupt the file). cache_size is in KiB when negative.
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA journal_size_limit=67108864",
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ";".join(SQLITE_PRAGMAS),
+            # Take the write lock when a transaction starts. A deferred transaction
+            # that reads and then writes can't wait for the lock and fails at once
+            # with "database is locked" when another process is writing.
+            'transaction_mode': 'IMMEDIATE',
+            # Seconds to wait for the write lock (SQLite's busy_timeout)
+            'timeout': 20,
+        },
+    }
+}
+
+# CACHE (core.cache)
+# One SQLite file shared by every worker on the host, with a short-lived
+# in-memory copy of hot entries in each process. Run `manage.py warm_cache`
+# after deploying.
+CACHES = {
+    "default": {
+        "BACKEND": "core.cache.SQLiteCache",
+        "LOCATION": BASE_DIR / "tmp" / "cache.sqlite3",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "MAX_ENTRIES": 20000,
+            # Seconds a process may serve its in-memory copy before rereading the file
+            "FRONT_TIMEOUT": 2,
+            "FRONT_MAX_ENTRIES": 1000,
+            # Longest anyone waits for another process to compute a missing entry
+            "LOCK_TIMEOUT": 10,
+        },
     }
 }
 
+# READ REPLICAS (core.replicas)
+# DATABASES aliases that serve reads; writes always go to "default". For a
+# second SQLite file, add
+#   DATABASES["replica"] = {
+#       "ENGINE": "django.db.backends.sqlite3",
+#       "NAME": BASE_DIR / "db.replica.sqlite3",
+#       "OPTIONS": {"init_command": "PRAGMA query_only=1"},
+#       "TEST": {"MIRROR": "default"},
+#   }
+# list it here, and keep it current with `manage.py sync_replica --every 10`.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+# After a write, that client reads from "default" for this long; keep it above the replicas' lag
+REPLICA_PIN_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -165,3 +224,73 @@ CLOUDINARY_STORAGE = {
 
 DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
 
+
+# UPLOADS
+# Largest file accepted, and the file types allowed with the bytes each must start with
+UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+UPLOAD_ALLOWED_TYPES = {
+    ".pdf": b"%PDF-",
+}
+
+# Chunked uploads: parts are assembled here before being handed to storage
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, "tmp", "chunked")
+CHUNKED_UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# FILE DELIVERY (core.delivery)
+# "django" streams files itself with Range support; "x-accel" (nginx) and
+# "x-sendfile" (Apache) hand the transfer to the front proxy. For x-accel,
+# nginx needs an internal location at the prefix that maps to MEDIA_ROOT.
+FILE_DELIVERY = "django"
+FILE_DELIVERY_ACCEL_PREFIX = "/protected-media/"
+# Redirect to short-lived signed URLs instead of answering directly
+FILE_DELIVERY_SIGNED_URLS = False
+FILE_DELIVERY_SIGNED_URL_MAX_AGE = 5 * 60
+# How long browsers may reuse a file they have fetched
+FILE_DELIVERY_MAX_AGE = 60 * 60
+
+# BACKGROUND JOBS (core.jobs, run with `manage.py run_worker`)
+# Run jobs in-process after commit instead, for setups without a worker
+JOBS_RUN_INLINE = False
+JOB_WORKER_CONCURRENCY = 2
+# Retry after 30s, 60s, 120s, ... up to an hour
+JOB_RETRY_BACKOFF = 30
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+# A RUNNING job older than this is assumed lost and queued again; keep it above the slowest job
+JOB_LOCK_TIMEOUT = 30 * 60
+JOB_KEEP_DAYS = 7
+# Task name -> seconds between runs
+JOB_PERIODIC = {
+    "purge_chunked_uploads": 60 * 60,
+    "purge_jobs": 24 * 60 * 60,
+    # Trending scores decay with age, so they are recomputed through the day
+    "recompute_scores": 15 * 60,
+}
+
+# VIEW / DOWNLOAD COUNTERS (core.counters)
+# Buffered hits are written at most this many seconds after the first one...
+COUNTER_FLUSH_SECONDS = 30
+# ...or as soon as this many uploads have hits waiting
+COUNTER_FLUSH_THRESHOLD = 500
+# A user counts once per upload and kind in this window
+COUNTER_DEDUPE_SECONDS = 30 * 60
+# Most (user, upload, kind) marks each process remembers for that; the oldest go first
+COUNTER_DEDUPE_MAX_ENTRIES = 50000
+
+# JSON API (core.api)
+# Bearer tokens from /api/v1/token/ last this long; changing the password revokes them sooner
+API_TOKEN_MAX_AGE = 30 * 24 * 60 * 60
+
+# REPORTS
+# Distinct reporters that hide a listed upload until a moderator reviews it (0 turns this off)
+REPORT_AUTO_HIDE_THRESHOLD = 5
+
+# REQUEST METRICS (core.metrics)
+METRICS_ENABLED = True
+# Send the per-request breakdown back in a Server-Timing header
+METRICS_SERVER_TIMING = True
+METRICS_PREFIX = "jntunoteshub"
+# Log queries slower than this many milliseconds to "core.slow_queries" (None turns it off)
+METRICS_SLOW_QUERY_MS = 250
+# Lets a Prometheus scraper read /metrics/ with "Authorization: Bearer <token>"; staff can always read it
+METRICS_TOKEN = None
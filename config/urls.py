@@ -1,17 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
-from django.conf import settings
-from django.conf.urls.static import static
-
+# Uploaded files are only ever served through core's views, which check who
+# may have them; never add a static() route for MEDIA_URL here.
 urlpatterns = [
     # Your app
     path("", include("core.urls")),
     path("admin/", admin.site.urls),
-
-    
-
-   
 ]
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
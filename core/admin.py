@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Branch, Semester, Subject, Upload, Rating, Report, PointsLog
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Blob, Branch, Job, Semester, Subject, Upload, Rating, Report, PointsLog, UserPoints
+from .search import fts_enabled, search_upload_ids
+
+ADMIN_SEARCH_LIMIT = 1000
 
 
 @admin.register(Branch)
@@ -21,10 +27,21 @@ class SubjectAdmin(admin.ModelAdmin):
 
 @admin.register(Upload)
 class UploadAdmin(admin.ModelAdmin):
-    list_display = ["title", "upload_type", "status", "subject", "uploader", "created_at"]
-    list_filter = ["upload_type", "status", "subject__branch", "subject__semester"]
+    list_display = [
+        "title", "upload_type", "status", "subject", "uploader", "avg_rating", "rating_count", "report_count",
+        "created_at",
+    ]
+    list_filter = ["upload_type", "status", "branch", "semester"]
     search_fields = ["title", "description", "uploader__username"]
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not fts_enabled():
+            return super().get_search_results(request, queryset, search_term)
+
+        # Ranked FTS lookup, plus an exact (indexed) uploader match in place of LIKE scans
+        ids = search_upload_ids(search_term, listed_only=False, limit=ADMIN_SEARCH_LIMIT)
+        return queryset.filter(Q(pk__in=ids) | Q(uploader__username=search_term.strip())), False
+
 
 @admin.register(Rating)
 class RatingAdmin(admin.ModelAdmin):
@@ -41,3 +58,29 @@ class ReportAdmin(admin.ModelAdmin):
 class PointsLogAdmin(admin.ModelAdmin):
     list_display = ["user", "action", "points_change", "created_at"]
     list_filter = ["action", "created_at"]
+
+
+@admin.register(UserPoints)
+class UserPointsAdmin(admin.ModelAdmin):
+    list_display = ["user", "points"]
+    search_fields = ["user__username"]
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ["sha256", "file", "size", "ref_count", "previews_at", "created_at"]
+    list_filter = ["previews_at"]
+    readonly_fields = ["sha256", "file", "size", "ref_count", "created_at"]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["name", "status", "attempts", "max_attempts", "run_at", "locked_by", "created_at", "finished_at"]
+    list_filter = ["status", "name"]
+    actions = ["retry_jobs"]
+
+    @admin.action(description="Queue selected jobs to run again now")
+    def retry_jobs(self, request, queryset):
+        queryset.exclude(status="RUNNING").update(
+            status="QUEUED", attempts=0, run_at=timezone.now(), finished_at=None, last_error=""
+        )
@@ -0,0 +1,222 @@
+"""
+The read-only JSON API under /api/v1/.
+
+Uploads are read with .values() and serialized straight from the row dicts,
+so no model instances are built. `?fields=` picks which of UPLOAD_FIELDS
+come back, and only the columns behind those fields are selected. Lists take
+the same filters and sort modes as the home feed and page with the same cursor.
+
+Clients send either the session cookie or "Authorization: Bearer <token>"
+with a token from /api/v1/token/. Tokens are signed, not stored: each holds
+the user id and a fingerprint of the password hash, so changing the password
+revokes every token issued before it.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .feed import FEED_PAGE_SIZE, FEED_SORTS, feed_cursor_token, feed_order
+from .models import Upload
+
+TOKEN_SALT = "core.api.token"
+
+API_PAGE_SIZE_MAX = 100
+
+# Public name -> the columns it is built from
+UPLOAD_FIELDS = {
+    "id": ("id",),
+    "title": ("title",),
+    "description": ("description",),
+    "type": ("upload_type",),
+    "status": ("status",),
+    "created_at": ("created_at",),
+    "subject_id": ("subject_id",),
+    "subject": ("subject__name",),
+    "branch_id": ("branch_id",),
+    "branch": ("branch__name",),
+    "semester": ("semester__number",),
+    "uploader": ("uploader__username",),
+    "rating_count": ("rating_count",),
+    "view_count": ("view_count",),
+    "download_count": ("download_count",),
+    "avg_rating": ("rating_sum", "rating_count"),
+    "thumbnail": ("blob__thumbnail",),
+    "url": ("id",),
+    "file_url": ("id",),
+}
+
+LIST_FIELDS = [
+    "id", "title", "type", "status", "created_at", "subject", "branch", "semester", "avg_rating", "thumbnail", "url",
+]
+DETAIL_FIELDS = [*LIST_FIELDS, "description", "uploader", "rating_count", "view_count", "download_count", "file_url"]
+
+# Written with .update() by core.ratings and core.counters, which bump no feed generation;
+# cached list pages leave them out and they are read fresh for each response
+LIVE_FIELDS = {"avg_rating", "rating_count", "view_count", "download_count"}
+
+
+def _avg_rating(row):
+    count = row["rating_count"]
+    return round(row["rating_sum"] / count, 1) if count else None
+
+
+def _thumbnail(row):
+    name = row["blob__thumbnail"]
+    return reverse("preview_image", args=[name]) if name else None
+
+
+# Fields that are not just their one column
+_FORMATTERS = {
+    "created_at": lambda row: row["created_at"].isoformat(),
+    "avg_rating": _avg_rating,
+    "thumbnail": _thumbnail,
+    "url": lambda row: reverse("view_note", args=[row["id"]]),
+    "file_url": lambda row: reverse("note_file", args=[row["id"]]),
+}
+
+
+def parse_fields(value, default):
+    """The field names asked for in `?fields=`, or `default`. Raises ValueError naming any unknown ones."""
+    if not value:
+        return list(default)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in UPLOAD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or list(default)
+
+
+def parse_limit(value):
+    return min(int(value), API_PAGE_SIZE_MAX) if value.isdigit() and int(value) > 0 else FEED_PAGE_SIZE
+
+
+def _columns(fields, extra=()):
+    return list(dict.fromkeys([*extra, *(column for name in fields for column in UPLOAD_FIELDS[name])]))
+
+
+def serialize_upload(row, fields):
+    return {
+        name: _FORMATTERS[name](row) if name in _FORMATTERS else row[UPLOAD_FIELDS[name][0]] for name in fields
+    }
+
+
+def upload_rows_page(qs, fields, cursor=None, limit=FEED_PAGE_SIZE, sort=""):
+    """
+    feed_page() as serialized dicts with only `fields`.
+
+    Returns (results, next_token); the token is the one feed_page() uses.
+    """
+    column = FEED_SORTS[sort]
+    rows = list(feed_order(qs, cursor, sort).values(*_columns(fields, ("id", column)))[: limit + 1])
+    next_token = ""
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_token = feed_cursor_token(sort, last[column], last["id"])
+    return [serialize_upload(row, fields) for row in rows[:limit]], next_token
+
+
+def cached_fields(fields):
+    """The part of `fields` a cached list page may hold, plus the id with_live_fields() needs."""
+    return list(dict.fromkeys(["id", *(name for name in fields if name not in LIVE_FIELDS)]))
+
+
+def with_live_fields(results, fields):
+    """Rows from a page built with cached_fields(), completed to `fields` from the database."""
+    live = [name for name in fields if name in LIVE_FIELDS]
+    current = {}
+    if live and results:
+        rows = Upload.objects.filter(pk__in=[row["id"] for row in results]).values(*_columns(live, ("id",)))
+        current = {row["id"]: serialize_upload(row, live) for row in rows}
+    missing = dict.fromkeys(live)
+    return [
+        {name: merged[name] for name in fields}
+        for merged in ({**row, **current.get(row["id"], missing)} for row in results)
+    ]
+
+
+def visible_uploads(user):
+    """The uploads `user` may open; the queryset form of the note views' permission check."""
+    if user.is_staff:
+        return Upload.objects.all()
+    return Upload.objects.filter(Q(listed=True) | Q(uploader=user))
+
+
+def upload_detail(user, pk, fields):
+    """One serialized upload, or None if it doesn't exist or `user` may not see it."""
+    row = visible_uploads(user).filter(pk=pk).values(*_columns(fields)).first()
+    return None if row is None else serialize_upload(row, fields)
+
+
+# ---------- responses ----------
+def body_etag(body):
+    return '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
+def json_response(request, body, etag):
+    """
+    A 200 with the JSON `body` (bytes), or a 304 if the client already has it.
+
+    The answer depends on who asks, so shared caches must not keep it, and
+    clients revalidate every time.
+    """
+    response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization", "Cookie"])
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def error_response(status, message):
+    response = JsonResponse({"error": message}, status=status)
+    if status == 401:
+        response["WWW-Authenticate"] = 'Bearer realm="api"'
+    return response
+
+
+# ---------- tokens ----------
+def _password_fingerprint(user):
+    return salted_hmac(TOKEN_SALT, user.password).hexdigest()[:16]
+
+
+def issue_token(user):
+    return signing.dumps({"u": user.pk, "p": _password_fingerprint(user)}, salt=TOKEN_SALT)
+
+
+def user_for_token(token):
+    """The active user a token was issued to, or None if it is bad, expired or revoked."""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.API_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    user = User.objects.filter(pk=payload.get("u"), is_active=True).first()
+    if user is None or not constant_time_compare(str(payload.get("p", "")), _password_fingerprint(user)):
+        return None
+    return user
+
+
+def api_auth(view):
+    """Use the bearer token's user if one is sent, else the session user; 401 if there is neither."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        if header.startswith("Bearer "):
+            user = user_for_token(header[len("Bearer "):].strip())
+            if user is None:
+                return error_response(401, "Invalid or expired token.")
+            request.user = user
+        elif not request.user.is_authenticated:
+            return error_response(401, "Authentication required.")
+        return view(request, *args, **kwargs)
+
+    return wrapper
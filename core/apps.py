@@ -1,5 +1,35 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+
+
+def ensure_search_index(sender, using, **kwargs):
+    from .search import ensure_search_index
+
+    ensure_search_index(using)
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import tasks  # registers the job queue's tasks
+        from .blobs import release_upload_blob
+        from .catalog import invalidate_catalog
+        from .feed import remember_feed_placement, upload_changed
+        from .metrics import install as install_metrics
+
+        if settings.METRICS_ENABLED:
+            install_metrics()
+
+        post_migrate.connect(ensure_search_index, sender=self)
+        post_delete.connect(release_upload_blob, sender=self.get_model("Upload"), dispatch_uid="upload_release_blob")
+
+        upload = self.get_model("Upload")
+        pre_save.connect(remember_feed_placement, sender=upload, dispatch_uid="upload_feed_placement")
+        post_save.connect(upload_changed, sender=upload, dispatch_uid="upload_feed_save")
+        post_delete.connect(upload_changed, sender=upload, dispatch_uid="upload_feed_delete")
+
+        for model in ("Branch", "Semester", "Subject"):
+            post_save.connect(invalidate_catalog, sender=self.get_model(model), dispatch_uid=f"catalog_save_{model}")
+            post_delete.connect(invalidate_catalog, sender=self.get_model(model), dispatch_uid=f"catalog_delete_{model}")
@@ -0,0 +1,509 @@
+"""
+Query budgets and latency measurements for every named route in core.urls.
+
+seed_dataset() fills the database with a realistic spread of uploads,
+ratings, reports and points. Each function registered with @route builds one
+request for a route name. measure() runs the requests through the test
+client, counting queries and timing them. core.tests checks the counts
+against QUERY_BUDGETS at two dataset sizes. `manage.py benchmark` records
+p50/p95 latencies into a JSON baseline and compares later runs with it.
+"""
+import io
+import json
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from .api import issue_token
+from .blobs import store_blob
+from .catalog import bump_catalog_version, get_catalog
+from .counters import forget_seen_hits
+from .delivery import signed_file_url
+from .models import Branch, PointsLog, Rating, Report, Semester, Subject, Upload, UserPoints
+from .previews import preview_names
+from .ratings import recount_upload_stats
+from .uploads import start_chunked_upload, write_chunk
+
+# Most queries each route may run, whatever the size of the data behind it.
+# Counts include the session and user lookups every logged-in request makes.
+QUERY_BUDGETS = {
+    "home": 4,
+    "logout": 4,
+    "upload_note": 3,
+    "view_note": 5,
+    "note_file": 3,
+    "note_download": 3,
+    "signed_file": 0,
+    "preview_image": 0,
+    "api_chunked_start": 4,
+    "api_chunked_upload": 3,
+    "api_chunked_finish": 21,
+    "rate_note": 7,
+    "report_note": 10,
+    "my_uploads": 4,
+    "delete_upload": 17,
+    "leaderboard": 8,
+    "api_subjects": 2,
+    "get_subjects": 2,
+    "api_catalog": 2,
+    "api_search": 4,
+    "api_v1_uploads": 3,
+    "api_v1_upload": 3,
+    "api_v1_token": 1,
+    "admin_uploads": 4,
+    "moderation_queue": 4,
+    "moderate_uploads": 5,
+    "verify_upload": 6,
+    "remove_upload": 6,
+    "admin_reports": 4,
+    "export_data": 3,
+    "metrics": 2,
+    "privacy_policy": 3,
+    "terms": 3,
+    "disclaimer": 3,
+    "contact": 3,
+}
+
+# Routes not exercised, and why
+SKIPPED_ROUTES = {
+    "signup": "renders core/signup.html, which is not in the tree",
+    "login": "renders core/login.html, which is not in the tree",
+}
+
+DEFAULT_SIZES = [1000, 10000]
+
+BENCHMARK_PDF = b"%PDF-1.4\n% benchmark\n" + b"0" * 4096 + b"\n%%EOF\n"
+
+_routes = {}
+
+
+def route(name):
+    """Register a function that builds the request for route `name`: (client, method, path, kwargs)."""
+
+    def register(func):
+        _routes[name] = func
+        return func
+
+    return register
+
+
+def route_names():
+    """Every named route in core.urls, less SKIPPED_ROUTES."""
+    return sorted(
+        name for name in get_resolver().reverse_dict if isinstance(name, str) and name not in SKIPPED_ROUTES
+    )
+
+
+def scratch_caches(directory):
+    """CACHES pointing the default cache at a file in `directory`, so runs don't touch the real one."""
+    return {"default": {**settings.CACHES["default"], "LOCATION": os.path.join(directory, "cache.sqlite3")}}
+
+
+def seed_dataset(uploads=1000, ratings_per_upload=3, reports_every=20):
+    """
+    Bulk-insert `uploads` uploads with ratings, reports and points.
+
+    Returns a BenchmarkData holding the users and rows the routes need.
+    """
+    branches = Branch.objects.bulk_create([Branch(name=f"Branch {i}") for i in range(3)])
+    semesters = Semester.objects.bulk_create([Semester(number=i) for i in range(1, 9)])
+    Subject.objects.bulk_create(
+        [
+            Subject(branch=b, semester=s, name=f"Subject {i}")
+            for b in branches
+            for s in semesters
+            for i in range(4)
+        ]
+    )
+    subjects = list(Subject.objects.all())
+
+    password = make_password("benchmark")
+    user_count = max(10, uploads // 10)
+    User.objects.bulk_create(
+        [User(username=f"user{i}", password=password) for i in range(user_count)]
+        + [User(username="staff", password=password, is_staff=True)]
+    )
+    users = list(User.objects.filter(username__startswith="user").order_by("id"))
+    staff = User.objects.get(username="staff")
+    member = users[0]
+
+    blob = store_blob(ContentFile(BENCHMARK_PDF), "benchmark.pdf")
+    statuses = ["VERIFIED"] * 14 + ["UNVERIFIED"] * 5 + ["HIDDEN"]
+    types = [key for key, _ in Upload.TYPE_CHOICES]
+    rows = []
+    for i in range(uploads):
+        subject = subjects[i % len(subjects)]
+        rows.append(
+            Upload(
+                uploader=users[i % len(users)],
+                subject=subject,
+                branch_id=subject.branch_id,
+                semester_id=subject.semester_id,
+                title=f"Unit {i % 5 + 1} notes on {subject.name} #{i}",
+                description="Handwritten notes covering the whole unit with solved examples.",
+                file=blob.file.name,
+                blob=blob,
+                upload_type=types[i % len(types)],
+                status=statuses[i % len(statuses)],
+            )
+        )
+    Upload.objects.bulk_create(rows, batch_size=1000)
+    upload_ids = list(Upload.objects.order_by("id").values_list("id", flat=True))
+    blob.ref_count = len(upload_ids)
+    blob.save(update_fields=["ref_count"])
+
+    Rating.objects.bulk_create(
+        [
+            Rating(user=users[(n + k) % len(users)], upload_id=pk, stars=(n + k) % 5 + 1)
+            for n, pk in enumerate(upload_ids)
+            for k in range(1, ratings_per_upload + 1)
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    Report.objects.bulk_create(
+        [
+            Report(reporter=users[(n + 1) % len(users)], upload_id=pk, reason=Report.REASON_CHOICES[n % 4][0])
+            for n, pk in enumerate(upload_ids)
+            if n % reports_every == 0
+        ],
+        batch_size=1000,
+    )
+    recount_upload_stats()
+
+    PointsLog.objects.bulk_create(
+        [PointsLog(user_id=row.uploader_id, action="Uploaded note", points_change=10) for row in rows],
+        batch_size=1000,
+    )
+    UserPoints.objects.bulk_create(
+        [UserPoints(user=u, points=10 * (uploads // len(users)) + i % 7) for i, u in enumerate(users)],
+        batch_size=1000,
+    )
+
+    # bulk_create sends no signals, so empty the cache and rebuild the catalog by
+    # hand; every route then starts from the same cache and hit counter state,
+    # whatever ran before
+    cache.clear()
+    forget_seen_hits()
+    bump_catalog_version()
+    get_catalog()
+
+    note = Upload.objects.filter(uploader=member, status="VERIFIED").order_by("id").first()
+    return BenchmarkData(staff=staff, member=member, note=note, subject=subjects[0], uploads=uploads)
+
+
+class BenchmarkData:
+    def __init__(self, staff, member, note, subject, uploads):
+        self.staff = staff
+        self.member = member
+        self.note = note
+        self.subject = subject
+        self.uploads = uploads
+        self.anon_client = Client()
+        self.member_client = Client()
+        self.member_client.force_login(member)
+        self.staff_client = Client()
+        self.staff_client.force_login(staff)
+
+    def throwaway_upload(self):
+        blob = store_blob(ContentFile(BENCHMARK_PDF), "benchmark.pdf")
+        return Upload.objects.create(
+            uploader=self.member,
+            subject=self.subject,
+            title="Throwaway",
+            file=blob.file.name,
+            blob=blob,
+            upload_type="NOTES",
+        )
+
+    def chunked_upload(self, complete=False):
+        chunked = start_chunked_upload(
+            self.member, self.subject.id, "Chunked", "", "NOTES", "chunked.pdf", len(BENCHMARK_PDF)
+        )
+        if complete:
+            write_chunk(chunked, io.BytesIO(BENCHMARK_PDF), 0, len(BENCHMARK_PDF))
+        return chunked
+
+
+@route("home")
+def _home(data):
+    return data.member_client, "get", reverse("home"), {}
+
+
+@route("logout")
+def _logout(data):
+    client = Client()
+    client.force_login(data.member)
+    return client, "post", reverse("logout"), {}
+
+
+@route("upload_note")
+def _upload_note(data):
+    return data.member_client, "get", reverse("upload_note"), {}
+
+
+@route("view_note")
+def _view_note(data):
+    return data.member_client, "get", reverse("view_note", args=[data.note.id]), {}
+
+
+@route("note_file")
+def _note_file(data):
+    return data.member_client, "get", reverse("note_file", args=[data.note.id]), {"HTTP_RANGE": "bytes=0-1023"}
+
+
+@route("note_download")
+def _note_download(data):
+    return data.member_client, "get", reverse("note_download", args=[data.note.id]), {}
+
+
+@route("signed_file")
+def _signed_file(data):
+    note = data.note
+    url = signed_file_url(note.file.name, "note.pdf", False, note.blob_id, int(note.created_at.timestamp()))
+    return data.anon_client, "get", url, {}
+
+
+@route("preview_image")
+def _preview_image(data):
+    name = preview_names(data.note.blob_id)[0]
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(b"RIFF\x1a\x00\x00\x00WEBPVP8L"))
+    return data.anon_client, "get", reverse("preview_image", args=[name]), {}
+
+
+@route("api_chunked_start")
+def _api_chunked_start(data):
+    params = {
+        "size": len(BENCHMARK_PDF),
+        "subject": data.subject.id,
+        "title": "Chunked",
+        "upload_type": "NOTES",
+        "filename": "chunked.pdf",
+    }
+    return data.member_client, "post", reverse("api_chunked_start"), {"data": params}
+
+
+@route("api_chunked_upload")
+def _api_chunked_upload(data):
+    chunked = data.chunked_upload()
+    return data.member_client, "get", reverse("api_chunked_upload", args=[chunked.pk]), {}
+
+
+@route("api_chunked_finish")
+def _api_chunked_finish(data):
+    chunked = data.chunked_upload(complete=True)
+    return data.member_client, "post", reverse("api_chunked_finish", args=[chunked.pk]), {}
+
+
+@route("rate_note")
+def _rate_note(data):
+    return data.member_client, "post", reverse("rate_note", args=[data.note.id]), {"data": {"stars": 4}}
+
+
+@route("report_note")
+def _report_note(data):
+    return data.member_client, "post", reverse("report_note", args=[data.note.id]), {"data": {"reason": "SPAM"}}
+
+
+@route("my_uploads")
+def _my_uploads(data):
+    return data.member_client, "get", reverse("my_uploads"), {}
+
+
+@route("delete_upload")
+def _delete_upload(data):
+    upload = data.throwaway_upload()
+    return data.member_client, "post", reverse("delete_upload", args=[upload.id]), {}
+
+
+@route("leaderboard")
+def _leaderboard(data):
+    return data.member_client, "get", reverse("leaderboard"), {}
+
+
+@route("api_subjects")
+def _api_subjects(data):
+    params = {"branch_id": data.subject.branch_id, "semester_id": data.subject.semester_id}
+    return data.member_client, "get", reverse("api_subjects"), {"data": params}
+
+
+@route("get_subjects")
+def _get_subjects(data):
+    params = {"branch_id": data.subject.branch_id, "semester_id": data.subject.semester_id}
+    return data.member_client, "get", reverse("get_subjects"), {"data": params}
+
+
+@route("api_catalog")
+def _api_catalog(data):
+    return data.member_client, "get", reverse("api_catalog"), {}
+
+
+@route("api_search")
+def _api_search(data):
+    return data.member_client, "get", reverse("api_search"), {"data": {"q": "unit notes"}}
+
+
+@route("api_v1_uploads")
+def _api_v1_uploads(data):
+    token = issue_token(data.member)
+    return data.anon_client, "get", reverse("api_v1_uploads"), {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+@route("api_v1_upload")
+def _api_v1_upload(data):
+    return data.member_client, "get", reverse("api_v1_upload", args=[data.note.id]), {}
+
+
+@route("api_v1_token")
+def _api_v1_token(data):
+    params = {"username": data.member.username, "password": "benchmark"}
+    return data.anon_client, "post", reverse("api_v1_token"), {"data": params}
+
+
+@route("admin_uploads")
+def _admin_uploads(data):
+    return data.staff_client, "get", reverse("admin_uploads"), {"data": {"sort": "reports"}}
+
+
+@route("moderation_queue")
+def _moderation_queue(data):
+    return data.staff_client, "get", reverse("moderation_queue"), {}
+
+
+@route("moderate_uploads")
+def _moderate_uploads(data):
+    ids = Upload.objects.filter(status="UNVERIFIED").values_list("id", flat=True)[:50]
+    params = {"action": "verify", "ids": list(ids), "next": reverse("moderation_queue")}
+    return data.staff_client, "post", reverse("moderate_uploads"), {"data": params}
+
+
+@route("verify_upload")
+def _verify_upload(data):
+    return data.staff_client, "post", reverse("verify_upload", args=[data.note.id]), {}
+
+
+@route("remove_upload")
+def _remove_upload(data):
+    upload = data.throwaway_upload()
+    return data.staff_client, "post", reverse("remove_upload", args=[upload.id]), {}
+
+
+@route("admin_reports")
+def _admin_reports(data):
+    return data.staff_client, "get", reverse("admin_reports"), {}
+
+
+@route("export_data")
+def _export_data(data):
+    return data.staff_client, "get", reverse("export_data", args=["uploads"]), {"data": {"format": "ndjson"}}
+
+
+@route("metrics")
+def _metrics(data):
+    return data.staff_client, "get", reverse("metrics"), {}
+
+
+@route("privacy_policy")
+def _privacy_policy(data):
+    return data.member_client, "get", reverse("privacy_policy"), {}
+
+
+@route("terms")
+def _terms(data):
+    return data.member_client, "get", reverse("terms"), {}
+
+
+@route("disclaimer")
+def _disclaimer(data):
+    return data.member_client, "get", reverse("disclaimer"), {}
+
+
+@route("contact")
+def _contact(data):
+    return data.member_client, "get", reverse("contact"), {}
+
+
+def measure(data, name, repeats=1):
+    """
+    Request route `name` `repeats` times.
+
+    Returns {"queries", "status", "p50_ms", "p95_ms"}. "queries" is the
+    highest count seen, and "status" is the last response's status code.
+    """
+    timings = []
+    queries = 0
+    status = None
+    for _ in range(repeats):
+        client, method, path, kwargs = _routes[name](data)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(captured.captured_queries))
+        status = response.status_code
+
+    if len(timings) > 1:
+        cuts = statistics.quantiles(timings, n=20, method="inclusive")
+        p50, p95 = statistics.median(timings), cuts[18]
+    else:
+        p50 = p95 = timings[0]
+    return {"queries": queries, "status": status, "p50_ms": round(p50, 3), "p95_ms": round(p95, 3)}
+
+
+def run_benchmark(data, repeats=20, names=None, progress=None):
+    results = {}
+    for name in names or route_names():
+        if name not in _routes:
+            continue
+        results[name] = measure(data, name, repeats)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def compare(baseline, current, tolerance=0.25, min_delta_ms=2.0):
+    """
+    Regressions in `current` against `baseline`, as readable strings.
+
+    A view regresses when its p95 grows by more than `tolerance` (and by at
+    least `min_delta_ms`, to ignore noise on fast views), or when it runs
+    more queries than before.
+    """
+    problems = []
+    for size, views in current.get("sizes", {}).items():
+        before_views = baseline.get("sizes", {}).get(size, {})
+        for name, now in views.items():
+            before = before_views.get(name)
+            if before is None:
+                continue
+            if now["queries"] > before["queries"]:
+                problems.append(f"{name} @ {size}: {before['queries']} -> {now['queries']} queries")
+            limit = before["p95_ms"] * (1 + tolerance)
+            if now["p95_ms"] > limit and now["p95_ms"] - before["p95_ms"] >= min_delta_ms:
+                problems.append(f"{name} @ {size}: p95 {before['p95_ms']:.1f} -> {now['p95_ms']:.1f} ms")
+    return problems
+
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_results(path, results):
+    with open(path, "w") as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write("\n")
@@ -0,0 +1,100 @@
+"""
+Content-addressed storage for uploaded files.
+
+Bytes are stored once under blobs/<aa>/<sha256><ext>, and every Upload with
+the same contents points at that one Blob. Blob.ref_count tracks how many
+uploads use it. The stored file, and any previews rendered from it, are
+deleted only when the last reference is released, by a job that first
+checks the same bytes haven't been stored again in the meantime.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Blob
+from .pipeline import schedule_post_delete
+
+READ_SIZE = 64 * 1024
+
+
+def sha256_of(fileobj):
+    """Hash an open file from the start, leaving it rewound."""
+    hasher = hashlib.sha256()
+    fileobj.seek(0)
+    for data in iter(lambda: fileobj.read(READ_SIZE), b""):
+        hasher.update(data)
+    fileobj.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_name(sha256, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f"blobs/{sha256[:2]}/{sha256}{ext}"
+
+
+def _add_reference(sha256):
+    return Blob.objects.filter(pk=sha256).update(ref_count=F("ref_count") + 1)
+
+
+def store_blob(fileobj, filename, sha256=None, size=None):
+    """
+    Return the Blob for `fileobj`'s contents with one more reference.
+
+    The bytes are written to storage only if no blob with that hash exists.
+    """
+    sha256 = sha256 or sha256_of(fileobj)
+
+    if _add_reference(sha256):
+        return Blob.objects.get(pk=sha256)
+
+    name = blob_name(sha256, filename)
+    if not default_storage.exists(name):
+        fileobj.seek(0)
+        name = default_storage.save(name, fileobj)
+    if size is None:
+        size = default_storage.size(name)
+
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(sha256=sha256, file=name, size=size, ref_count=1)
+    except IntegrityError:
+        # Someone stored the same bytes at the same moment
+        _add_reference(sha256)
+        return Blob.objects.get(pk=sha256)
+
+
+def release_blob(sha256):
+    """Drop one reference; delete the blob and its file once nothing uses it."""
+    with transaction.atomic():
+        Blob.objects.filter(pk=sha256, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+        blob = Blob.objects.filter(pk=sha256, ref_count=0).first()
+        if blob is None:
+            return False
+        names = [f.name for f in (blob.file, blob.thumbnail, blob.preview) if f.name]
+        blob.delete()
+        schedule_post_delete(names)
+    return True
+
+
+def delete_released_files(names):
+    """
+    Delete the stored files in `names` that no Blob uses any more.
+
+    Every name starts with its blob's hash, so a file whose bytes were
+    uploaded again after the release, and reused under the same name, is kept.
+    """
+    names = list(names)
+    hashes = {os.path.basename(name)[:64] for name in names}
+    in_use = set(Blob.objects.filter(pk__in=hashes).values_list("pk", flat=True))
+    for name in names:
+        if os.path.basename(name)[:64] not in in_use:
+            default_storage.delete(name)
+
+
+def release_upload_blob(sender, instance, **kwargs):
+    """post_delete receiver for Upload, so cascaded deletes release their blobs too."""
+    if instance.blob_id:
+        release_blob(instance.blob_id)
@@ -0,0 +1,322 @@
+"""
+A cache shared by every worker on one host, with no outside service.
+
+SQLiteCache keeps entries in an SQLite file (LOCATION) that all processes
+open, in WAL mode so reads don't wait on writes. In front of it, each
+process keeps a small in-memory LRU of recently read entries. An entry
+stays there for at most FRONT_TIMEOUT seconds, so a change made by another
+process is seen within that time. Changes made by this process are seen at
+once.
+
+The file is capped at MAX_ENTRIES. Past that, expired entries are dropped
+first, then the least recently read ones. Keys are versioned the usual
+Django way (VERSION, version=, incr_version).
+
+get_or_set() with a callable protects against stampedes:
+
+- Single flight: when an entry is missing, one process computes it while
+  the others wait for the result.
+- Early recompute: a hot entry is refreshed shortly before it expires, one
+  process at a time. How early is random, scaled by how long the value took
+  to compute ("XFetch"), so the entry never lapses under load.
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    delta REAL NOT NULL DEFAULT 0,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);
+"""
+
+# Reading an entry refreshes its LRU timestamp at most this often, to keep reads from writing
+ACCESS_RESOLUTION = 60
+# Sets between checks of the entry count
+CULL_CHECK_EVERY = 100
+# How much earlier than its expiry a hot entry may be recomputed, as a multiple of its compute time
+EARLY_RECOMPUTE_BETA = 1.0
+LOCK_POLL_INTERVAL = 0.05
+
+_fronts = {}
+_fronts_lock = threading.Lock()
+
+
+class FrontTier:
+    """A process-wide LRU of pickled entries: key -> (pickled value, expires, delta, held until)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[3] <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, pickled, expires, delta, hold):
+        held_until = time.time() + hold
+        if expires is not None:
+            held_until = min(held_until, expires)
+        with self.lock:
+            self.entries[key] = (pickled, expires, delta, held_until)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def _front_for(location, max_entries):
+    with _fronts_lock:
+        if location not in _fronts:
+            _fronts[location] = FrontTier(max_entries)
+        return _fronts[location]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.location = str(location)
+        self.front_timeout = float(options.get("FRONT_TIMEOUT", 2))
+        self.lock_timeout = float(options.get("LOCK_TIMEOUT", 10))
+        self.front = _front_for(self.location, int(options.get("FRONT_MAX_ENTRIES", 1000)))
+        self._conn = None
+        self._pid = None
+        self._sets = 0
+
+    # ---------- storage ----------
+    def _db(self):
+        # A connection per backend instance (Django makes one per thread), reopened after a fork
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.location)), exist_ok=True)
+            conn = sqlite3.connect(self.location, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _expiry(self, timeout):
+        # An absolute time.time(), or None for no expiry
+        return self.get_backend_timeout(timeout)
+
+    def _read(self, key):
+        """(pickled value, expires, delta) for a live entry, or None."""
+        now = time.time()
+        entry = self.front.get(key, now)
+        if entry is not None:
+            return entry[:3]
+
+        row = self._db().execute(
+            "SELECT value, expires, delta, accessed FROM cache_entry WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        if now - row[3] > ACCESS_RESOLUTION:
+            self._db().execute("UPDATE cache_entry SET accessed = ? WHERE key = ?", (now, key))
+        self.front.put(key, row[0], row[1], row[2], self.front_timeout)
+        return row[:3]
+
+    def _insert_if_missing(self, key, stored, expires, delta=0.0):
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM cache_entry WHERE key = ? AND expires <= ?", (key, now))
+            inserted = db.execute(
+                "INSERT OR IGNORE INTO cache_entry (key, value, expires, delta, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, stored, expires, delta, now),
+            ).rowcount
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return bool(inserted)
+
+    def _write(self, key, value, timeout, delta=0.0, only_if_missing=False):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self._expiry(timeout)
+        if only_if_missing:
+            if not self._insert_if_missing(key, pickled, expires, delta):
+                return False
+        else:
+            self._db().execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires, delta, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, pickled, expires, delta, time.time()),
+            )
+        self.front.put(key, pickled, expires, delta, self.front_timeout)
+        self._maybe_cull()
+        return True
+
+    def _maybe_cull(self):
+        self._sets += 1
+        if self._sets % CULL_CHECK_EVERY:
+            return
+        db = self._db()
+        if db.execute("SELECT count(*) FROM cache_entry").fetchone()[0] <= self._max_entries:
+            return
+        db.execute("DELETE FROM cache_entry WHERE expires <= ?", (time.time(),))
+        excess = db.execute("SELECT count(*) FROM cache_entry").fetchone()[0] - self._max_entries
+        if excess > 0:
+            # Least recently read first, down to a fraction below the cap so this doesn't run on every set
+            drop = excess + self._max_entries // self._cull_frequency
+            db.execute(
+                "DELETE FROM cache_entry WHERE key IN "
+                "(SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)",
+                (drop,),
+            )
+            self.front.clear()
+
+    # ---------- cache API ----------
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._write(key, value, timeout, only_if_missing=True)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._read(key)
+        return default if entry is None else pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        touched = self._db().execute(
+            "UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self._expiry(timeout), key, now),
+        ).rowcount
+        self.front.discard(key)
+        return bool(touched)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.front.discard(key)
+        return bool(self._db().execute("DELETE FROM cache_entry WHERE key = ?", (key,)).rowcount)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._read(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db()
+        # Read and write under the write lock, so concurrent increments all count
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT value, expires FROM cache_entry WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                "UPDATE cache_entry SET value = ? WHERE key = ?", (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.front.discard(key)
+        return value
+
+    def clear(self):
+        self._db().execute("DELETE FROM cache_entry")
+        self.front.clear()
+
+    def close(self, **kwargs):
+        # Kept open between requests; SQLite connections are cheap to hold
+        pass
+
+    # ---------- stampede protection ----------
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the cached value, computing and storing `default()` if needed.
+
+        With a callable `default`, only one process computes a missing or
+        nearly expired value at a time; see the module docstring.
+        """
+        if not callable(default):
+            return super().get_or_set(key, default, timeout, version)
+
+        db_key = self.make_and_validate_key(key, version=version)
+        entry = self._read(db_key)
+        if entry is not None:
+            pickled, expires, delta = entry
+            token = self._due_early(expires, delta) and self._lock(db_key)
+            if not token:
+                return pickle.loads(pickled)
+            # This process won the early refresh; the others keep the current value
+            try:
+                return self._compute(db_key, default, timeout)
+            finally:
+                self._unlock(db_key, token)
+
+        deadline = time.time() + self.lock_timeout
+        while not (token := self._lock(db_key)):
+            # Someone else is computing it; wait for their result
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = self._read(db_key)
+            if entry is not None:
+                return pickle.loads(entry[0])
+            if time.time() >= deadline:
+                return self._compute(db_key, default, timeout)
+        try:
+            # It may have been stored while this process waited for the lock
+            entry = self._read(db_key)
+            if entry is not None:
+                return pickle.loads(entry[0])
+            return self._compute(db_key, default, timeout)
+        finally:
+            self._unlock(db_key, token)
+
+    def _due_early(self, expires, delta):
+        if expires is None or not delta:
+            return False
+        # 1 - random() is in (0, 1], so the log is defined
+        return time.time() - delta * EARLY_RECOMPUTE_BETA * math.log(1 - random.random()) >= expires
+
+    def _compute(self, db_key, default, timeout):
+        started = time.monotonic()
+        value = default()
+        self._write(db_key, value, timeout, delta=time.monotonic() - started)
+        return value
+
+    def _lock(self, db_key):
+        """Take the compute lock for `db_key`. Returns its token, or None if someone else holds it."""
+        token = uuid.uuid4().bytes
+        if self._insert_if_missing(f"lock:{db_key}", token, time.time() + self.lock_timeout):
+            return token
+        return None
+
+    def _unlock(self, db_key, token):
+        # Only our own lock; if it timed out, someone else may hold it by now
+        self._db().execute("DELETE FROM cache_entry WHERE key = ? AND value = ?", (f"lock:{db_key}", token))
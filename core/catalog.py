@@ -0,0 +1,180 @@
+"""
+In-process copy of the Branch / Semester / Subject catalog.
+
+The catalog is read on most pages but only changes when an admin edits it or
+seed_subjects runs. Each process keeps one built copy. Save/delete signals
+on the three models bump a version counter in the cache once their
+transaction commits, and a process
+rebuilds its copy when it sees the counter move (checked at most every
+CHECK_INTERVAL seconds). Copies are also rebuilt after MAX_AGE seconds, in
+case the cache is not shared between processes.
+
+The rows a copy is built from are kept in the cache under the version, so
+with a shared cache only the first process to see a new version reads them
+from the database.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Branch, Semester, Subject
+
+VERSION_KEY = "catalog:version"
+CATALOG_FILE = Path(__file__).resolve().parent / "data" / "catalog.json"
+CHECK_INTERVAL = 5
+MAX_AGE = 300
+
+_lock = threading.Lock()
+_catalog = None
+_checked_at = 0.0
+
+
+class Catalog:
+    def __init__(self, version, branches, semesters, subjects):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.branches = branches
+        self.semesters = semesters
+        self.subjects = subjects
+
+        # branch id -> semester id -> [[subject id, name], ...], names in order
+        tree = {}
+        for s in subjects:
+            tree.setdefault(s["branch_id"], {}).setdefault(s["semester_id"], []).append([s["id"], s["name"]])
+        self.tree = tree
+
+        self.bundle = json.dumps(
+            {"branches": branches, "semesters": semesters, "tree": tree},
+            separators=(",", ":"),
+        ).encode()
+        self.bundle_gzip = gzip.compress(self.bundle)
+        # Derived from the content, so every process agrees on it
+        self.etag = hashlib.sha1(self.bundle).hexdigest()[:16]
+
+    def subjects_for(self, branch_id=None, semester_id=None):
+        return [
+            {"id": s["id"], "name": s["name"]}
+            for s in self.subjects
+            if (not branch_id or s["branch_id"] == branch_id) and (not semester_id or s["semester_id"] == semester_id)
+        ]
+
+
+def _rows():
+    return (
+        list(Branch.objects.order_by("name").values("id", "name")),
+        list(Semester.objects.order_by("number").values("id", "number")),
+        list(Subject.objects.order_by("name", "id").values("id", "name", "branch_id", "semester_id")),
+    )
+
+
+def _fresh_version():
+    # Starts from the clock, so a version the cache dropped never comes back at an old value
+    return int(time.time() * 1000)
+
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _fresh_version(), None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def _rows_key(version):
+    return f"catalog:rows:{version}"
+
+
+def _build(version):
+    return Catalog(version, *cache.get_or_set(_rows_key(version), _rows, MAX_AGE))
+
+
+def warm_catalog():
+    """Reload the catalog rows into the shared cache, for processes that start after this."""
+    version = catalog_version()
+    rows = _rows()
+    cache.set(_rows_key(version), rows, MAX_AGE)
+    return Catalog(version, *rows)
+
+
+def get_catalog():
+    global _catalog, _checked_at
+
+    now = time.monotonic()
+    if _catalog is not None and now - _checked_at < CHECK_INTERVAL:
+        return _catalog
+
+    version = catalog_version()
+    with _lock:
+        if _catalog is None or _catalog.version != version or now - _catalog.built_at > MAX_AGE:
+            _catalog = _build(version)
+        _checked_at = now
+    return _catalog
+
+
+def bump_catalog_version():
+    """Bump the shared version and drop this process's copy, right away."""
+    global _catalog
+
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, _fresh_version(), None)
+    _catalog = None
+
+
+def invalidate_catalog(**kwargs):
+    """Signal receiver: bump_catalog_version() once the transaction commits."""
+    # Bumped earlier, another process could cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+def read_catalog_file(path=None):
+    """The catalog data file: {"version", "semesters": [...], "branches": [{"name", "semesters": {n: [names]}}]}."""
+    with open(path or CATALOG_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    numbers = set(data["semesters"])
+    for branch in data["branches"]:
+        unknown = {int(n) for n in branch["semesters"]} - numbers
+        if unknown:
+            raise ValueError(f"{branch['name']}: semesters {sorted(unknown)} are not in the semester list")
+    return data
+
+
+def load_catalog(data, batch_size=500):
+    """
+    Insert whatever part of `data` is missing, in a handful of queries.
+
+    Existing rows are left alone, so this is safe to run on every deploy.
+    Returns how many (branches, semesters, subjects) were created.
+    """
+    models = (Branch, Semester, Subject)
+    with transaction.atomic():
+        before = [model.objects.count() for model in models]
+        Branch.objects.bulk_create([Branch(name=b["name"]) for b in data["branches"]], ignore_conflicts=True)
+        Semester.objects.bulk_create([Semester(number=n) for n in data["semesters"]], ignore_conflicts=True)
+
+        branch_ids = dict(
+            Branch.objects.filter(name__in=[b["name"] for b in data["branches"]]).values_list("name", "id")
+        )
+        semester_ids = dict(Semester.objects.values_list("number", "id"))
+        Subject.objects.bulk_create(
+            [
+                Subject(branch_id=branch_ids[b["name"]], semester_id=semester_ids[int(number)], name=name)
+                for b in data["branches"]
+                for number, names in b["semesters"].items()
+                for name in names
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        created = tuple(model.objects.count() - n for model, n in zip(models, before))
+
+    # bulk_create sends no signals
+    invalidate_catalog()
+    return created
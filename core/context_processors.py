@@ -1,10 +1,11 @@
-from django.db.models import Sum
-from .models import PointsLog
+from .points import get_user_points
+
 
 def user_points(request):
-    if request.user.is_authenticated:
-        total = PointsLog.objects.filter(user=request.user).aggregate(
-            total=Sum("points_change")
-        )["total"] or 0
-        return {"user_points": total}
-    return {"user_points": 0}
+    if not request.user.is_authenticated:
+        return {"user_points": 0}
+
+    # Read the balance at most once per request, however many templates render
+    if not hasattr(request, "_user_points"):
+        request._user_points = get_user_points(request.user)
+    return {"user_points": request._user_points}
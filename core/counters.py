@@ -0,0 +1,122 @@
+"""
+View and download counts for uploads, without a database write per hit.
+
+record_hit() adds to a buffer in this process. The buffer is written to
+Upload in one UPDATE, with a CASE per counter, in these cases:
+
+- once it holds COUNTER_FLUSH_THRESHOLD uploads (on the request that fills it)
+- otherwise COUNTER_FLUSH_SECONDS after its first hit (on a timer thread)
+
+A worker that stops loses at most one interval of hits.
+
+A user counts once per upload and kind every COUNTER_DEDUPE_SECONDS, so
+refreshes and repeated requests don't inflate the numbers. The marks are kept
+in this process, up to COUNTER_DEDUPE_MAX_ENTRIES of them, so counting a hit
+never writes to the shared cache or pushes cached pages out of it. A user
+whose requests reach several workers may count once per worker.
+"""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Case, F, Value, When
+
+from .models import Upload
+
+logger = logging.getLogger(__name__)
+
+# Kind of hit -> the Upload column it counts into
+KINDS = {"view": "view_count", "download": "download_count"}
+
+_lock = threading.Lock()
+# (kind, upload id) -> hits not yet written
+_pending = Counter()
+_timer = None
+# (kind, upload id, user id) -> when its dedupe window ends, oldest first
+_seen = OrderedDict()
+
+
+def _first_in_window(key, now):
+    # Call with _lock held
+    while _seen and (next(iter(_seen.values())) <= now or len(_seen) >= settings.COUNTER_DEDUPE_MAX_ENTRIES):
+        _seen.popitem(last=False)
+    if _seen.get(key, 0) > now:
+        return False
+    # Re-added at the end, so the dict stays in window order
+    _seen.pop(key, None)
+    _seen[key] = now + settings.COUNTER_DEDUPE_SECONDS
+    return True
+
+
+def forget_seen_hits():
+    """Start every user's dedupe window over, in this process."""
+    with _lock:
+        _seen.clear()
+
+
+def record_hit(kind, upload_id, user_id):
+    """Count one hit of `kind` on an upload. Returns False if the user was already counted this window."""
+    global _timer
+    with _lock:
+        if not _first_in_window((kind, upload_id, user_id), time.monotonic()):
+            return False
+        _pending[kind, upload_id] += 1
+        full = len(_pending) >= settings.COUNTER_FLUSH_THRESHOLD
+        if not full and _timer is None:
+            _timer = threading.Timer(settings.COUNTER_FLUSH_SECONDS, _flush_on_timer)
+            _timer.daemon = True
+            _timer.start()
+    if full:
+        flush_hits()
+    return True
+
+
+def pending_hits():
+    """{(kind, upload id): hits} still waiting to be written."""
+    with _lock:
+        return dict(_pending)
+
+
+def flush_hits():
+    """Write the buffered hits to the database. Returns the number of uploads updated."""
+    global _timer
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not pending:
+        return 0
+
+    try:
+        return _add_hits(pending)
+    except DatabaseError:
+        logger.exception("Could not write %d buffered hit counts; keeping them for the next flush", len(pending))
+        with _lock:
+            _pending.update(pending)
+        return 0
+
+
+def _add_hits(pending):
+    by_upload = defaultdict(dict)
+    for (kind, upload_id), hits in pending.items():
+        by_upload[upload_id][kind] = hits
+
+    changes = {}
+    for kind, column in KINDS.items():
+        whens = [When(pk=pk, then=Value(hits[kind])) for pk, hits in by_upload.items() if kind in hits]
+        if whens:
+            changes[column] = F(column) + Case(*whens, default=Value(0))
+    return Upload.objects.filter(pk__in=list(by_upload)).update(**changes)
+
+
+def _flush_on_timer():
+    try:
+        flush_hits()
+    finally:
+        # This thread's connections aren't closed by any request cycle
+        connections.close_all()
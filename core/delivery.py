@@ -0,0 +1,192 @@
+"""
+Serving stored files to users.
+
+Views decide who may have a file. Everything here is about sending the bytes
+as cheaply as possible, controlled by two settings:
+
+- FILE_DELIVERY: "django" streams the file with Range/206 support;
+  "x-accel" (nginx) and "x-sendfile" (Apache/lighttpd) pass the transfer to
+  the front proxy, so the worker only sends headers.
+- FILE_DELIVERY_SIGNED_URLS: redirect to a short-lived HMAC-signed URL
+  instead of answering directly. The signed URL is checked without a session
+  or database query, so it can be served from a separate host or cache.
+
+Every mode answers conditional requests (ETag / Last-Modified) with a 304
+first.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+SIGNING_SALT = "core.delivery"
+STREAM_BLOCK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def upload_filename(upload):
+    ext = os.path.splitext(upload.file.name)[1].lower()
+    title = " ".join(re.sub(r"[^\w\- ]+", "", upload.title).split()) or f"note-{upload.pk}"
+    return f"{title}{ext}"
+
+
+def upload_file_response(request, upload, as_attachment=False):
+    """Send `upload`'s file in whichever way FILE_DELIVERY_SIGNED_URLS/FILE_DELIVERY say."""
+    etag = upload.blob_id or ""
+    last_modified = int(upload.created_at.timestamp())
+    filename = upload_filename(upload)
+
+    if getattr(settings, "FILE_DELIVERY_SIGNED_URLS", False):
+        url = signed_file_url(upload.file.name, filename, as_attachment, etag, last_modified)
+        response = HttpResponseRedirect(url)
+        # The redirect is per user and expires; never let it be shared or reused
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+    return file_response(request, upload.file.name, filename, as_attachment, etag, last_modified)
+
+
+def signed_file_url(name, filename, as_attachment, etag, last_modified):
+    token = signing.dumps(
+        {"n": name, "f": filename, "a": as_attachment, "e": etag, "m": last_modified},
+        salt=SIGNING_SALT,
+        compress=True,
+    )
+    return reverse("signed_file", args=[token])
+
+
+def load_signed_file(token):
+    """Return the payload of a signed file URL, or raise Http404 if it is forged or expired."""
+    try:
+        return signing.loads(token, salt=SIGNING_SALT, max_age=settings.FILE_DELIVERY_SIGNED_URL_MAX_AGE)
+    except signing.BadSignature:
+        raise Http404("Link expired or invalid")
+
+
+def file_response(request, name, filename, as_attachment=False, etag="", last_modified=None, immutable=False):
+    """
+    Answer a GET/HEAD for the stored file `name`.
+
+    `etag` should change whenever the bytes do (the blob's SHA-256 does);
+    stored files never change in place, so clients may cache them freely.
+    With `immutable`, for files anyone may see under a name that changes with
+    the bytes, shared caches may keep the response for a year too.
+    """
+    quoted_etag = quote_etag(etag) if etag else None
+    not_modified = get_conditional_response(request, etag=quoted_etag, last_modified=last_modified)
+    if not_modified is not None:
+        response = not_modified
+    else:
+        mode = getattr(settings, "FILE_DELIVERY", "django")
+        if mode == "x-accel":
+            response = HttpResponse()
+            response["X-Accel-Redirect"] = settings.FILE_DELIVERY_ACCEL_PREFIX + name
+        elif mode == "x-sendfile":
+            response = HttpResponse()
+            response["X-Sendfile"] = default_storage.path(name)
+        else:
+            response = _stream_response(request, name, quoted_etag, last_modified)
+
+        if response.status_code != 416:
+            content_type, encoding = mimetypes.guess_type(filename)
+            response["Content-Type"] = content_type or "application/octet-stream"
+            response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+        response["Accept-Ranges"] = "bytes"
+
+    if quoted_etag:
+        response["ETag"] = quoted_etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    if immutable:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, max_age=settings.FILE_DELIVERY_MAX_AGE)
+    return response
+
+
+def parse_range(header, size, if_range="", etag=None, last_modified=None):
+    """
+    The single byte range asked for, as an inclusive (start, end) pair.
+
+    Returns None to send the whole file: no usable Range header, several
+    ranges, or an If-Range that no longer matches. Returns False if the
+    range lies entirely past the end of the file.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    if if_range:
+        if if_range.startswith(('"', "W/")):
+            if if_range != etag:
+                return None
+        elif last_modified is None or parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the final `last` bytes
+        length = min(int(last), size)
+        if length == 0:
+            return False
+        return size - length, size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(fileobj, start, length):
+    try:
+        fileobj.seek(start)
+        while length > 0:
+            data = fileobj.read(min(STREAM_BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+
+def _stream_response(request, name, etag, last_modified):
+    try:
+        size = default_storage.size(name)
+    except (FileNotFoundError, OSError):
+        raise Http404("File not found")
+
+    byte_range = parse_range(
+        request.headers.get("Range", ""),
+        size,
+        request.headers.get("If-Range", ""),
+        etag,
+        last_modified,
+    )
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    if request.method == "HEAD":
+        response = HttpResponse(status=206 if byte_range else 200)
+    else:
+        fileobj = default_storage.open(name, "rb")
+        response = StreamingHttpResponse(_read_range(fileobj, start, length), status=206 if byte_range else 200)
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(length)
+    return response
@@ -0,0 +1,202 @@
+"""
+Bulk export and import of upload metadata.
+
+export_chunks() streams one of TABLES as CSV or NDJSON. Rows are read with
+values_list().iterator(), so memory stays flat whatever the row count. The
+staff export view and `manage.py export_data` both write these chunks.
+
+import_rows() loads a dump back, one batch per bulk_create and transaction.
+Primary keys are kept, so loading the same dump twice adds nothing. Rows
+whose key or unique columns are already taken are skipped, as are rows that
+point at a user, subject or upload that doesn't exist. bulk_create skips
+save() and signals, so everything those would do is done here per batch:
+branch and semester are copied from the subject, blob references counted,
+and the feed caches retired. Rating/report totals and points balances are
+left to refresh_totals(), which recounts them once at the end.
+"""
+import csv
+import json
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import F
+
+from .feed import bump_feed_generations
+from .models import Blob, PointsLog, Rating, Report, Subject, Upload
+from .points import reconcile_balances
+from .ratings import recount_upload_stats
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 2000
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Name -> (model, columns in export order)
+TABLES = {
+    "uploads": (
+        Upload,
+        [
+            "id", "uploader_id", "subject_id", "branch_id", "semester_id", "title", "description", "file", "blob_id",
+            "upload_type", "status", "created_at", "rating_sum", "rating_count", "report_count", "view_count",
+            "download_count",
+        ],
+    ),
+    "ratings": (Rating, ["id", "user_id", "upload_id", "stars"]),
+    "reports": (Report, ["id", "reporter_id", "upload_id", "reason", "created_at"]),
+    "points_log": (PointsLog, ["id", "user_id", "action", "points_change", "created_at"]),
+}
+
+
+def _text(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class _Echo:
+    # csv.writer hands back whatever write() returns, so rows come out as strings
+    def write(self, value):
+        return value
+
+
+def export_chunks(name, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield table `name` as text in `fmt`, up to `chunk_size` rows per chunk."""
+    model, columns = TABLES[name]
+    rows = model.objects.order_by("pk").values_list(*columns).iterator(chunk_size=chunk_size)
+    writer = csv.writer(_Echo())
+    if fmt == "csv":
+        yield writer.writerow(columns)
+
+    chunk = []
+    for row in rows:
+        if fmt == "csv":
+            chunk.append(writer.writerow(["" if value is None else _text(value) for value in row]))
+        else:
+            chunk.append(json.dumps(dict(zip(columns, map(_text, row))), ensure_ascii=False) + "\n")
+        if len(chunk) >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def read_records(lines, fmt="csv"):
+    """Parse an export back into dicts of column -> raw value. `lines` is any iterable of text lines."""
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+    else:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+@contextmanager
+def _keep_timestamps(model):
+    # bulk_create fills auto_now_add fields with the current time; keep the exported ones instead.
+    # This changes the field for the whole process, so imports belong in commands, not views.
+    fields = [field for field in model._meta.concrete_fields if getattr(field, "auto_now_add", False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _build(model, fields, record):
+    values = {}
+    for column, field in fields.items():
+        if column not in record:
+            raise ValueError(f"Missing column {column!r}")
+        value = record[column]
+        if value == "" and field.null:
+            value = None
+        values[column] = field.to_python(value)
+    return model(**values)
+
+
+def _existing(model, ids):
+    ids = {pk for pk in ids if pk is not None}
+    return set(model.objects.filter(pk__in=ids).values_list("pk", flat=True)) if ids else set()
+
+
+def _drop_orphans(model, rows):
+    """Rows whose required foreign keys all exist. Missing optional ones are cleared."""
+    for field in model._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        found = _existing(field.related_model, (getattr(row, field.attname) for row in rows))
+        kept = []
+        for row in rows:
+            value = getattr(row, field.attname)
+            if value is None or value in found:
+                kept.append(row)
+            elif field.null:
+                setattr(row, field.attname, None)
+                kept.append(row)
+        rows = kept
+    return rows
+
+
+def _place_uploads(rows):
+    # Upload.save() copies these from the subject; bulk_create doesn't call it
+    subjects = Subject.objects.filter(pk__in={row.subject_id for row in rows})
+    placements = {pk: (branch, semester) for pk, branch, semester in subjects.values_list("pk", "branch", "semester")}
+    for row in rows:
+        row.branch_id, row.semester_id = placements[row.subject_id]
+
+
+def _import_batch(model, rows):
+    """Insert one batch; returns how many rows went in."""
+    taken = _existing(model, (row.pk for row in rows))
+    rows = _drop_orphans(model, [row for row in rows if row.pk not in taken])
+    if not rows:
+        return 0
+    if model is Upload:
+        _place_uploads(rows)
+
+    with transaction.atomic():
+        model.objects.bulk_create(rows, ignore_conflicts=True)
+        inserted = _existing(model, (row.pk for row in rows))
+        if model is Upload:
+            rows = [row for row in rows if row.pk in inserted]
+            for blob_id, count in Counter(row.blob_id for row in rows if row.blob_id).items():
+                Blob.objects.filter(pk=blob_id).update(ref_count=F("ref_count") + count)
+            bump_feed_generations({(row.subject_id, row.branch_id, row.semester_id) for row in rows})
+    return len(inserted)
+
+
+def import_rows(name, records, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Load `records` (from read_records) into table `name`.
+
+    Every record needs an id. Returns (inserted, skipped). `progress(done)`
+    is called after every batch with the number of records read so far.
+    """
+    model, columns = TABLES[name]
+    fields = {column: model._meta.get_field(column.removesuffix("_id")) for column in columns}
+    report = progress or (lambda done: None)
+    inserted = read = 0
+    batch = []
+
+    with _keep_timestamps(model):
+        for record in records:
+            batch.append(_build(model, fields, record))
+            read += 1
+            if len(batch) >= batch_size:
+                inserted += _import_batch(model, batch)
+                batch = []
+                report(read)
+        if batch:
+            inserted += _import_batch(model, batch)
+            report(read)
+    return inserted, read - inserted
+
+
+def refresh_totals(names):
+    """Recount what the tables in `names` feed into, after an import."""
+    if {"uploads", "ratings", "reports"} & set(names):
+        recount_upload_stats()
+    if "points_log" in set(names):
+        reconcile_balances()
@@ -0,0 +1,129 @@
+"""
+Text extraction for uploaded files.
+
+PDFs are opened straight from storage and read page by page, stopping once
+MAX_TEXT_CHARS of text has been collected. Backlogs are processed on a
+process pool; workers only read files, and the parent writes their results
+back in bulk so SQLite sees a single writer.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Q
+from pypdf import PdfReader
+
+from .models import Upload, UploadText
+
+MAX_TEXT_CHARS = 100_000
+BATCH_SIZE = 50
+
+NOT_A_PDF = "Not a PDF"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def extract_pdf_text(fileobj, max_chars=MAX_TEXT_CHARS):
+    """Return (text, page_count) for a seekable PDF file object."""
+    reader = PdfReader(fileobj)
+    parts = []
+    size = 0
+    for page in reader.pages:
+        text = _WHITESPACE.sub(" ", page.extract_text() or "").strip()
+        if text:
+            parts.append(text)
+            size += len(text) + 1
+        if size >= max_chars:
+            break
+    return " ".join(parts)[:max_chars], len(reader.pages)
+
+
+def extract_upload_text(upload_id, name):
+    """Extract one stored file. Returns the field values for its UploadText row."""
+    row = {"upload_id": upload_id, "content": "", "pages": 0, "error": ""}
+    if not name.lower().endswith(".pdf"):
+        row["error"] = NOT_A_PDF
+        return row
+
+    try:
+        with default_storage.open(name, "rb") as fh:
+            row["content"], row["pages"] = extract_pdf_text(fh)
+    except Exception as exc:
+        row["error"] = f"{type(exc).__name__}: {exc}"[:200]
+    return row
+
+
+def save_extracted(rows):
+    UploadText.objects.bulk_create(
+        [UploadText(**row) for row in rows],
+        update_conflicts=True,
+        unique_fields=["upload"],
+        update_fields=["content", "pages", "error", "extracted_at"],
+    )
+
+
+def extract_for_upload(upload_id):
+    """Extract and store the text of a single upload in this process."""
+    name = Upload.objects.filter(pk=upload_id).values_list("file", flat=True).first()
+    if name:
+        save_extracted([extract_upload_text(upload_id, name)])
+
+
+def pending_uploads(retry_failed=False):
+    pending = Q(text__isnull=True)
+    if retry_failed:
+        pending |= Q(text__isnull=False) & ~Q(text__error="") & ~Q(text__error=NOT_A_PDF)
+    return Upload.objects.filter(pending).order_by("id")
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _extract_row(row):
+    return extract_upload_text(*row)
+
+
+def extract_pending(workers=None, batch_size=BATCH_SIZE, limit=None, retry_failed=False, progress=None):
+    """
+    Extract every upload that has no text yet, `batch_size` rows per write.
+
+    Safe to interrupt: finished batches are committed, and the next run picks
+    up whatever is still pending. Returns the number of uploads processed.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk = batch_size * workers
+    done = 0
+    last_id = 0
+
+    # Forked workers must not share the parent's open database connection
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while limit is None or done < limit:
+            size = chunk if limit is None else min(chunk, limit - done)
+            rows = list(
+                pending_uploads(retry_failed).filter(id__gt=last_id).values_list("id", "file")[:size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            batch = []
+            for row in pool.map(_extract_row, rows, chunksize=4):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    save_extracted(batch)
+                    done += len(batch)
+                    batch = []
+            if batch:
+                save_extracted(batch)
+                done += len(batch)
+
+            if progress:
+                progress(done)
+    return done
@@ -0,0 +1,219 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .catalog import get_catalog
+from .models import Upload
+from .pagination import decode_cursor, encode_cursor
+
+FEED_PAGE_SIZE = 24
+# Cached pages and grids are retired by the feed generations as soon as an
+# upload changes; the timeout only bounds writes that skip them (bulk inserts)
+FEED_CACHE_TIMEOUT = 10 * 60
+
+UPLOAD_TYPES = {key for key, _ in Upload.TYPE_CHOICES}
+
+# Sort mode -> the column the feed is ordered by, newest/highest first; scores come from core.ranking
+FEED_SORTS = {"": "created_at", "trending": "trending_score", "top": "top_score"}
+
+
+def feed_filters(params):
+    """Pick the home feed filters out of a QueryDict, dropping anything malformed."""
+    filters = {
+        "branch": params.get("branch", ""),
+        "semester": params.get("semester", ""),
+        "subject": params.get("subject", ""),
+        "type": params.get("type", ""),
+        "sort": params.get("sort", ""),
+    }
+    for key in ("branch", "semester", "subject"):
+        if not filters[key].isdigit():
+            filters[key] = ""
+    if filters["type"] not in UPLOAD_TYPES:
+        filters["type"] = ""
+    if filters["sort"] not in FEED_SORTS:
+        filters["sort"] = ""
+    return filters
+
+
+def feed_queryset(filters):
+    qs = Upload.objects.filter(listed=True)
+
+    if filters["branch"]:
+        qs = qs.filter(branch_id=filters["branch"])
+
+    if filters["semester"]:
+        qs = qs.filter(semester_id=filters["semester"])
+
+    if filters["subject"]:
+        qs = qs.filter(subject_id=filters["subject"])
+
+    if filters["type"]:
+        qs = qs.filter(upload_type=filters["type"])
+
+    return qs
+
+
+def parse_feed_cursor(token, sort=""):
+    cursor = decode_cursor(token, 2)
+    if cursor is None or not str(cursor[1]).isdigit():
+        return None
+    if sort:
+        score = cursor[0]
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            return None
+        return float(score), int(cursor[1])
+    created_at = parse_datetime(str(cursor[0]))
+    if created_at is None:
+        return None
+    return created_at, int(cursor[1])
+
+
+def feed_cursor_token(sort, value, pk):
+    """The token parse_feed_cursor() reads back, for a row whose sort column holds `value`."""
+    return encode_cursor([value if sort else value.isoformat(), pk])
+
+
+def feed_order(qs, cursor=None, sort=""):
+    """`qs` in feed order for `sort`, e.g. (-created_at, -id), starting after `cursor`."""
+    column = FEED_SORTS[sort]
+    qs = qs.order_by(f"-{column}", "-id")
+    if cursor:
+        value, pk = cursor
+        # The leading __lte bounds the index range scan
+        qs = qs.filter(Q(**{f"{column}__lte": value}) & (Q(**{f"{column}__lt": value}) | Q(id__lt=pk)))
+    return qs
+
+
+def feed_page(qs, cursor=None, limit=FEED_PAGE_SIZE, sort=""):
+    """
+    One page of `qs` in feed order for `sort`, starting after `cursor`.
+
+    Returns (items, next_token); next_token is "" on the last page.
+    """
+    items = list(feed_order(qs, cursor, sort)[: limit + 1])
+    next_token = ""
+    if len(items) > limit:
+        last = items[limit - 1]
+        next_token = feed_cursor_token(sort, getattr(last, FEED_SORTS[sort]), last.pk)
+    return items[:limit], next_token
+
+
+
+def _generation_keys(filters):
+    keys = [f"feed:gen:{key}:{filters[key]}" for key in ("branch", "semester", "subject") if filters[key]]
+    return keys or ["feed:gen:all"]
+
+
+def _fresh_generation():
+    # Starts from the clock, so a counter the cache dropped never comes back at an old value
+    return int(time.time() * 1000)
+
+
+def feed_generation(filters):
+    """A token that changes whenever an upload that could be listed under `filters` changes."""
+    keys = _generation_keys(filters)
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        for key in keys:
+            if key not in found:
+                cache.add(key, _fresh_generation(), None)
+        found = cache.get_many(keys)
+    return ".".join(str(found.get(key, 0)) for key in keys)
+
+
+def bump_feed_generations(placements):
+    """
+    Retire cached pages that could list uploads at these placements.
+
+    `placements` are (subject_id, branch_id, semester_id) tuples, e.g. from
+    values_list("subject_id", "branch_id", "semester_id").
+    """
+    keys = {"feed:gen:all"}
+    for subject_id, branch_id, semester_id in placements:
+        for name, value in (("subject", subject_id), ("branch", branch_id), ("semester", semester_id)):
+            if value is not None:
+                keys.add(f"feed:gen:{name}:{value}")
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, _fresh_generation(), None)
+
+    # After commit, or a request in between could cache the old rows under the new generation
+    transaction.on_commit(bump)
+
+
+def bump_uploads_generations(uploads):
+    """bump_feed_generations() for the uploads in a queryset, for writes that send no signals."""
+    bump_feed_generations(uploads.values_list("subject_id", "branch_id", "semester_id").distinct())
+
+
+def remember_feed_placement(sender, instance, raw=False, **kwargs):
+    """pre_save receiver for Upload: note where an existing upload was listed, in case it moves."""
+    if instance.pk and not raw:
+        instance._feed_placement = (
+            Upload.objects.filter(pk=instance.pk).values_list("subject_id", "branch_id", "semester_id").first()
+        )
+
+
+def upload_changed(sender, instance, **kwargs):
+    """post_save / post_delete receiver for Upload."""
+    placements = [(instance.subject_id, instance.branch_id, instance.semester_id)]
+    previous = getattr(instance, "_feed_placement", None)
+    if previous:
+        placements.append(previous)
+    bump_feed_generations(placements)
+
+
+def scores_version():
+    """A token that changes whenever core.ranking rewrites the scores."""
+    version = cache.get("feed:scores")
+    if version is None:
+        cache.add("feed:scores", _fresh_generation(), None)
+        version = cache.get("feed:scores", 0)
+    return str(version)
+
+
+def bump_scores_version():
+    """Retire cached pages in the score sorts, after core.ranking rewrites the scores."""
+    cache.set("feed:scores", _fresh_generation(), None)
+
+
+def feed_cache_key(prefix, filters, cursor_token=""):
+    """
+    A cache key for something built from one feed page.
+
+    It names the catalog version (cards show subject, branch and semester
+    names) and the feed generation, so it goes out of use as soon as either
+    moves. Keys for the score sorts also name the scores version.
+    """
+    parts = [filters[key] for key in ("branch", "semester", "subject", "type", "sort")]
+    if filters["sort"]:
+        parts.append(scores_version())
+    return ":".join([prefix, str(get_catalog().version), feed_generation(filters), *parts, cursor_token])
+
+
+def first_feed_page(filters, refresh=False):
+    """
+    feed_page() for the first page of `filters`, from the shared cache.
+
+    With `refresh`, the page is rebuilt and stored whether or not it was cached.
+    """
+
+    def build():
+        return feed_page(
+            feed_queryset(filters).select_related("subject", "branch", "semester", "blob"), sort=filters["sort"]
+        )
+
+    key = feed_cache_key("feed:first", filters)
+    if refresh:
+        page = build()
+        cache.set(key, page, FEED_CACHE_TIMEOUT)
+        return page
+    return cache.get_or_set(key, build, FEED_CACHE_TIMEOUT)
@@ -0,0 +1,187 @@
+"""
+A small database-backed job queue.
+
+Code registers functions with @task and queues them with enqueue(). The Job
+row is inserted in the caller's transaction, so a job exists exactly when the
+work that asked for it was committed. `manage.py run_worker` claims due jobs
+and runs them on a thread or process pool.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the database has it.
+Everywhere else (SQLite) it uses a conditional UPDATE that only one worker
+can win. Failed jobs are retried with exponential backoff until max_attempts.
+Jobs left RUNNING by a worker that died are requeued after JOB_LOCK_TIMEOUT.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .replicas import use_primary
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(name=None, max_attempts=5):
+    """Register a function as a job. Its payload is passed as keyword arguments."""
+
+    def register(func):
+        task_name = name or func.__name__
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        _tasks[task_name] = func
+        return func
+
+    return register
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise UnknownTask(name)
+
+
+def enqueue(name, payload=None, delay=0, unique_key=None, max_attempts=None):
+    """
+    Queue task `name` to run with `payload`, at least `delay` seconds from now.
+
+    With `unique_key`, nothing is queued if a job with that key already
+    exists. Returns the new Job, or None if it was a duplicate. With
+    JOBS_RUN_INLINE set, the task runs once the transaction commits instead.
+    """
+    func = get_task(name)
+    payload = payload or {}
+
+    if getattr(settings, "JOBS_RUN_INLINE", False):
+        transaction.on_commit(lambda: func(**payload))
+        return None
+
+    job = Job(
+        name=name,
+        payload=payload,
+        unique_key=unique_key,
+        max_attempts=max_attempts or func.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # Already queued under this unique_key
+        return None
+    return job
+
+
+def claim_jobs(worker_id, limit):
+    """Mark up to `limit` due jobs as RUNNING for `worker_id` and return them."""
+    now = timezone.now()
+    due = Job.objects.filter(status="QUEUED", run_at__lte=now).order_by("run_at", "id")
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+        # The status check makes this safe without row locks: a job another
+        # worker took in the meantime is no longer QUEUED, so it isn't updated
+        Job.objects.filter(id__in=ids, status="QUEUED").update(
+            status="RUNNING",
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, status="RUNNING", locked_by=worker_id, locked_at=now))
+
+
+def run_job(name, payload):
+    """Run one task. Returns None on success or the formatted error."""
+    close_old_connections()
+    try:
+        # Jobs often follow right behind the write that queued them
+        with use_primary():
+            get_task(name)(**payload)
+    except Exception:
+        logger.exception("Job %s failed", name)
+        return traceback.format_exc()[-4000:]
+    finally:
+        close_old_connections()
+    return None
+
+
+def retry_delay(attempts):
+    base = settings.JOB_RETRY_BACKOFF
+    delay = min(base * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    # Jitter keeps jobs that failed together from retrying together
+    return delay * random.uniform(0.8, 1.2)
+
+
+def finish_job(job, error=None):
+    """Record the outcome of a claimed job: done, back in the queue, or failed."""
+    now = timezone.now()
+    mine = Job.objects.filter(pk=job.pk, status="RUNNING", locked_by=job.locked_by)
+    if error is None:
+        mine.update(status="DONE", finished_at=now, locked_by="", last_error="")
+    elif job.attempts < job.max_attempts:
+        mine.update(
+            status="QUEUED",
+            run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+            locked_by="",
+            locked_at=None,
+            last_error=error,
+        )
+    else:
+        mine.update(status="FAILED", finished_at=now, locked_by="", last_error=error)
+
+
+def requeue_stale_jobs():
+    """
+    Recover jobs whose worker stopped without finishing them.
+
+    They go back in the queue, or are marked FAILED once out of attempts.
+    Returns how many were requeued.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status="RUNNING", locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT))
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status="FAILED", finished_at=now, locked_by="", last_error="Worker stopped while running this job"
+    )
+    return stale.update(status="QUEUED", locked_by="", locked_at=None)
+
+
+def schedule_periodic_jobs():
+    """
+    Queue each task in JOB_PERIODIC once per interval.
+
+    The unique key names the current interval, so any number of workers can
+    call this and each slot is still queued only once.
+    """
+    now = timezone.now().timestamp()
+    for name, interval in settings.JOB_PERIODIC.items():
+        enqueue(name, unique_key=f"periodic:{name}:{int(now // interval)}")
+
+
+def purge_finished_jobs(days=None):
+    days = settings.JOB_KEEP_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status__in=["DONE", "FAILED"], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def new_worker_id():
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
@@ -0,0 +1,162 @@
+"""
+Synthetic data for capacity testing.
+
+generate_load_data() adds users with uploads, ratings, reports and points,
+spread over the subjects already in the catalog (run seed_subjects first).
+Rows are built one batch at a time and written with bulk_create, one
+transaction per batch, so millions of rows take bounded memory and an
+interrupted run keeps what it wrote.
+
+Every upload shares one small PDF blob. Rating and report totals are set on
+each upload as it is built, and balances are written once at the end, so
+nothing has to be recounted over the whole table afterwards.
+"""
+import random
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+
+from .blobs import release_blob, store_blob
+from .models import Blob, PointsLog, Rating, Report, Subject, Upload, UserPoints
+
+LOAD_PDF = b"%PDF-1.4\n% load data\n" + b"0" * 4096 + b"\n%%EOF\n"
+
+UPLOAD_POINTS = 10
+
+# Roughly what the live site sees
+STATUS_WEIGHTS = {"VERIFIED": 70, "UNVERIFIED": 25, "HIDDEN": 3, "REMOVED": 2}
+
+
+def _batches(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+def generate_load_data(
+    users=1000,
+    uploads=10000,
+    ratings_per_upload=3,
+    reports_every=20,
+    batch_size=5000,
+    prefix="load",
+    seed=None,
+    progress=None,
+):
+    """
+    Insert the rows and return how many of each were created, by model name.
+
+    Usernames are `prefix` plus a number, continuing after any earlier run
+    with the same prefix. `progress(name, done, total)` is called after
+    every batch.
+    """
+    if ratings_per_upload >= users:
+        raise ValueError("ratings_per_upload must be less than users, so no one rates an upload twice")
+    subjects = list(Subject.objects.values_list("id", "branch_id", "semester_id"))
+    if not subjects:
+        raise ValueError("The catalog is empty; run seed_subjects first")
+
+    rng = random.Random(seed)
+    report = progress or (lambda name, done, total: None)
+    created = Counter()
+
+    # ---------- USERS ----------
+    password = make_password("load-data")
+    start = User.objects.filter(username__startswith=prefix).count()
+    user_ids = []
+    for offset, size in _batches(users, batch_size):
+        with transaction.atomic():
+            rows = User.objects.bulk_create(
+                [User(username=f"{prefix}{start + offset + i}", password=password) for i in range(size)]
+            )
+        user_ids.extend(u.pk for u in rows)
+        report("users", len(user_ids), users)
+    created["users"] = len(user_ids)
+
+    # ---------- UPLOADS, RATINGS, REPORTS ----------
+    blob = store_blob(ContentFile(LOAD_PDF), "load-data.pdf")
+
+    statuses = rng.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()), k=1000)
+    types = [key for key, _ in Upload.TYPE_CHOICES]
+    reasons = [key for key, _ in Report.REASON_CHOICES]
+    balances = Counter()
+
+    for offset, size in _batches(uploads, batch_size):
+        rows = []
+        ratings = []
+        reports = []
+        for n in range(offset, offset + size):
+            subject_id, branch_id, semester_id = subjects[n % len(subjects)]
+            uploader = user_ids[rng.randrange(len(user_ids))]
+            first_rater = rng.randrange(len(user_ids))
+            given = [
+                (user_ids[(first_rater + k) % len(user_ids)], rng.randint(1, 5)) for k in range(ratings_per_upload)
+            ]
+            reporter = user_ids[(first_rater + ratings_per_upload) % len(user_ids)] if n % reports_every == 0 else None
+            balances[uploader] += UPLOAD_POINTS
+            rows.append(
+                Upload(
+                    uploader_id=uploader,
+                    subject_id=subject_id,
+                    branch_id=branch_id,
+                    semester_id=semester_id,
+                    title=f"Unit {n % 5 + 1} notes #{n}",
+                    description="Synthetic upload for capacity testing.",
+                    file=blob.file.name,
+                    blob=blob,
+                    upload_type=types[n % len(types)],
+                    status=statuses[n % len(statuses)],
+                    rating_sum=sum(stars for _, stars in given),
+                    rating_count=len(given),
+                    report_count=1 if reporter else 0,
+                )
+            )
+            ratings.append(given)
+            reports.append(reporter)
+
+        with transaction.atomic():
+            Upload.objects.bulk_create(rows)
+            Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + size)
+            Rating.objects.bulk_create(
+                [
+                    Rating(user_id=user_id, upload_id=upload.pk, stars=stars)
+                    for upload, given in zip(rows, ratings)
+                    for user_id, stars in given
+                ]
+            )
+            Report.objects.bulk_create(
+                [
+                    Report(reporter_id=reporter, upload_id=upload.pk, reason=reasons[upload.pk % len(reasons)])
+                    for upload, reporter in zip(rows, reports)
+                    if reporter
+                ]
+            )
+            PointsLog.objects.bulk_create(
+                [
+                    PointsLog(user_id=upload.uploader_id, action="Uploaded note", points_change=UPLOAD_POINTS)
+                    for upload in rows
+                ]
+            )
+        created["uploads"] += size
+        created["ratings"] += size * ratings_per_upload
+        created["reports"] += sum(1 for reporter in reports if reporter)
+        created["points_log"] += size
+        report("uploads", created["uploads"], uploads)
+
+    # Each upload took its own reference above; drop the one store_blob took
+    release_blob(blob.pk)
+
+    # ---------- BALANCES ----------
+    # The users are new, so each balance is just what they earned here
+    balance_rows = list(balances.items())
+    for offset, size in _batches(len(balance_rows), batch_size):
+        with transaction.atomic():
+            UserPoints.objects.bulk_create(
+                [UserPoints(user_id=user_id, points=points) for user_id, points in balance_rows[offset : offset + size]]
+            )
+        report("balances", offset + size, len(balance_rows))
+    created["balances"] = len(balance_rows)
+    return dict(created)
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from core.benchmark import (
+    DEFAULT_SIZES,
+    QUERY_BUDGETS,
+    compare,
+    load_results,
+    run_benchmark,
+    save_results,
+    scratch_caches,
+    seed_dataset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every named route against seeded datasets in a throwaway test database, "
+        "and save the results or compare them with a saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default=",".join(str(size) for size in DEFAULT_SIZES),
+            help="Comma-separated upload counts to seed, e.g. 1000,10000,100000",
+        )
+        parser.add_argument("--repeats", type=int, default=20, help="Requests per route")
+        parser.add_argument("--routes", default="", help="Only these comma-separated route names")
+        parser.add_argument("--output", help="Write the results to this JSON file (e.g. the new baseline)")
+        parser.add_argument("--compare", help="Fail if results regress against this baseline JSON file")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown, as a fraction")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers")
+        names = [name.strip() for name in options["routes"].split(",") if name.strip()] or None
+        baseline = load_results(options["compare"]) if options["compare"] else None
+
+        results = {
+            "created_at": timezone.now().isoformat(),
+            "repeats": options["repeats"],
+            "sizes": {},
+        }
+        media_root = tempfile.mkdtemp(prefix="benchmark-media-")
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root, CACHES=scratch_caches(media_root), METRICS_SLOW_QUERY_MS=None
+            ):
+                for size in sizes:
+                    self.stdout.write(self.style.MIGRATE_HEADING(f"Seeding {size} uploads..."))
+                    with transaction.atomic():
+                        data = seed_dataset(size)
+                        results["sizes"][str(size)] = run_benchmark(
+                            data, options["repeats"], names, progress=self.report
+                        )
+                        # Start every size from an empty database
+                        transaction.set_rollback(True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        if options["output"]:
+            save_results(options["output"], results)
+            self.stdout.write(self.style.SUCCESS(f"✅ Results saved to {options['output']}"))
+
+        if baseline is not None:
+            problems = compare(baseline, results, options["tolerance"])
+            if problems:
+                for problem in problems:
+                    self.stderr.write(problem)
+                raise CommandError(f"{len(problems)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("✅ No regressions against the baseline"))
+
+    def report(self, name, result):
+        over = result["queries"] > QUERY_BUDGETS.get(name, result["queries"])
+        line = (
+            f"  {name:<22} {result['queries']:>3} queries  "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  [{result['status']}]"
+        )
+        self.stdout.write(self.style.ERROR(line + "  over budget") if over else line)
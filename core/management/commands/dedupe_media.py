@@ -0,0 +1,84 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.blobs import sha256_of, store_blob
+from core.models import Blob, Upload
+
+
+class Command(BaseCommand):
+    help = "Move uploads without a blob into content-addressed storage, collapsing identical files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+        parser.add_argument(
+            "--delete-orphans",
+            action="store_true",
+            help="Also delete files under uploads/ that no upload or blob refers to",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        moved = duplicates = missing = 0
+        seen = set(Blob.objects.values_list("sha256", flat=True))
+        old_names = set()
+
+        for upload in Upload.objects.filter(blob__isnull=True).order_by("id").iterator():
+            name = upload.file.name
+            if not name or not default_storage.exists(name):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f"Missing file for upload {upload.id}: {name}"))
+                continue
+
+            with default_storage.open(name, "rb") as fh:
+                sha256 = sha256_of(fh)
+                if sha256 in seen:
+                    duplicates += 1
+                seen.add(sha256)
+                moved += 1
+                if dry_run:
+                    continue
+
+                with transaction.atomic():
+                    blob = store_blob(fh, name, sha256=sha256)
+                    Upload.objects.filter(pk=upload.pk).update(blob=blob, file=blob.file.name)
+            old_names.add(name)
+
+        # Old copies are only removed once no row refers to them any more
+        removed = 0
+        if not dry_run:
+            in_use = set(Upload.objects.filter(file__in=old_names).values_list("file", flat=True))
+            for name in old_names - in_use:
+                default_storage.delete(name)
+                removed += 1
+
+        orphans = 0
+        if options["delete_orphans"]:
+            orphans = self.delete_orphans(dry_run)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Done! {moved} uploads moved to blobs, {duplicates} were duplicates, "
+                f"{removed} old files removed, {orphans} orphans removed, {missing} missing"
+            )
+        )
+
+    def delete_orphans(self, dry_run):
+        try:
+            _, files = default_storage.listdir("uploads")
+        except (NotImplementedError, FileNotFoundError):
+            self.stdout.write(self.style.WARNING("Storage can't list uploads/; skipping orphans"))
+            return 0
+
+        referenced = set(Upload.objects.values_list("file", flat=True))
+        referenced |= set(Blob.objects.values_list("file", flat=True))
+
+        count = 0
+        for filename in files:
+            name = f"uploads/{filename}"
+            if name not in referenced:
+                self.stdout.write(f"Orphan: {name}")
+                if not dry_run:
+                    default_storage.delete(name)
+                count += 1
+        return count
@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import EXPORT_CHUNK_SIZE, FORMATS, TABLES, export_chunks
+
+
+class Command(BaseCommand):
+    help = "Stream Upload, Rating, Report or PointsLog rows to a CSV or NDJSON file (or stdout)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", choices=list(TABLES))
+        parser.add_argument("--format", choices=list(FORMATS), default="csv")
+        parser.add_argument("--output", "-o", help="File to write; stdout if left out")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Rows fetched per round trip")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        start = time.monotonic()
+        chunks = export_chunks(options["table"], options["format"], options["chunk_size"])
+        if not options["output"]:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+
+        with open(options["output"], "w", encoding="utf-8", newline="") as out:
+            for chunk in chunks:
+                out.write(chunk)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Exported {options['table']} to {options['output']} in {time.monotonic() - start:.1f}s"
+            )
+        )
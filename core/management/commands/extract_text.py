@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.extraction import BATCH_SIZE, extract_pending
+
+
+class Command(BaseCommand):
+    help = "Extract searchable text from uploaded PDFs that have not been processed yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--retry-failed", action="store_true", help="Also retry files that failed before")
+
+    def handle(self, *args, **options):
+        total = extract_pending(
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            limit=options["limit"],
+            retry_failed=options["retry_failed"],
+            progress=lambda done: self.stdout.write(f"Processed {done} uploads..."),
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Done! Extracted text from {total} uploads"))
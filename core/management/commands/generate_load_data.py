@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadgen import generate_load_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-insert synthetic users, uploads, ratings, reports and points for capacity testing. "
+        "Never run this against the production database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Users to create")
+        parser.add_argument("--uploads", type=int, default=10000, help="Uploads to create")
+        parser.add_argument("--ratings-per-upload", type=int, default=3, help="Ratings on each upload")
+        parser.add_argument("--reports-every", type=int, default=20, help="Report one upload in this many")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per insert and per transaction")
+        parser.add_argument("--prefix", default="load", help="Username prefix for the synthetic users")
+        parser.add_argument("--seed", type=int, help="Random seed, for repeatable data")
+
+    def handle(self, *args, **options):
+        if min(options["users"], options["uploads"], options["batch_size"], options["reports_every"]) < 1:
+            raise CommandError("--users, --uploads, --batch-size and --reports-every must be at least 1")
+
+        self.last_line = 0.0
+        start = time.monotonic()
+        try:
+            created = generate_load_data(
+                users=options["users"],
+                uploads=options["uploads"],
+                ratings_per_upload=options["ratings_per_upload"],
+                reports_every=options["reports_every"],
+                batch_size=options["batch_size"],
+                prefix=options["prefix"],
+                seed=options["seed"],
+                progress=self.progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.monotonic() - start
+        rows = sum(created.values())
+        summary = ", ".join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Created {summary} in {elapsed:.1f}s ({rows / max(elapsed, 1e-6):.0f} rows/s)")
+        )
+
+    def progress(self, name, done, total):
+        # At most one line a second, plus the last one for each table
+        now = time.monotonic()
+        if done == total or now - self.last_line >= 1:
+            self.last_line = now
+            self.stdout.write(f"  {name}: {done}/{total}")
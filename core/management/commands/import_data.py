@@ -0,0 +1,57 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import FORMATS, IMPORT_BATCH_SIZE, TABLES, import_rows, read_records, refresh_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a dump written by export_data. Rows whose id or unique columns are taken, or that point at "
+        "missing users, subjects or uploads, are skipped. Upload totals and points balances are recounted after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", choices=list(TABLES))
+        parser.add_argument("file", help="The dump to load")
+        parser.add_argument("--format", choices=list(FORMATS), help="Default: from the file extension")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per insert and transaction")
+        parser.add_argument(
+            "--no-recount",
+            action="store_true",
+            help="Skip recounting totals, e.g. when more tables are about to be loaded",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        fmt = options["format"] or ("ndjson" if options["file"].endswith((".ndjson", ".jsonl")) else "csv")
+
+        self.last_line = 0.0
+        start = time.monotonic()
+        try:
+            with open(options["file"], encoding="utf-8", newline="") as lines:
+                inserted, skipped = import_rows(
+                    options["table"], read_records(lines, fmt), options["batch_size"], progress=self.progress
+                )
+        except OSError as exc:
+            raise CommandError(f"Could not read {options['file']}: {exc}")
+        except (ValueError, ValidationError) as exc:
+            raise CommandError(f"Bad row in {options['file']}: {exc}")
+
+        if not options["no_recount"]:
+            refresh_totals([options["table"]])
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Imported {inserted} {options['table']} rows, skipped {skipped}, in {elapsed:.1f}s "
+                f"({(inserted + skipped) / max(elapsed, 1e-6):.0f} rows/s)"
+            )
+        )
+
+    def progress(self, done):
+        now = time.monotonic()
+        if now - self.last_line >= 1:
+            self.last_line = now
+            self.stdout.write(f"  {done} rows read")
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.uploads import purge_stale_chunked_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that stopped receiving data, along with their part files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+
+    def handle(self, *args, **options):
+        total = purge_stale_chunked_uploads(options["hours"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Removed {total} stale chunked uploads"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.search import ensure_search_index, fts_enabled, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the upload full-text search table and triggers, and backfill it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not fts_enabled(using):
+            raise CommandError("Full-text search needs SQLite FTS5; other databases use the fallback search.")
+
+        ensure_search_index(using)
+        total = rebuild_search_index(using)
+        self.stdout.write(self.style.SUCCESS(f"✅ Indexed {total} uploads"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ranking import SCORE_BATCH_SIZE, update_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending and top-rated scores of every listed upload (also run by the job queue)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SCORE_BATCH_SIZE, help="Uploads written per transaction")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        start = time.monotonic()
+        total = update_scores(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Scored {total} uploads in {time.monotonic() - start:.2f}s"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.points import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-user points balances from the PointsLog ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = reconcile_balances(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Reconciled {total} balances"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.ratings import recount_upload_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild each upload's rating and report totals from the Rating and Report tables"
+
+    def handle(self, *args, **options):
+        total = recount_upload_stats()
+        self.stdout.write(self.style.SUCCESS(f"✅ Recounted {total} uploads"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.previews import BATCH_SIZE, render_pending
+
+
+class Command(BaseCommand):
+    help = "Render first-page thumbnails and previews for stored files that have none yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--retry-failed", action="store_true", help="Also retry files that failed before")
+
+    def handle(self, *args, **options):
+        total = render_pending(
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            limit=options["limit"],
+            retry_failed=options["retry_failed"],
+            progress=lambda done: self.stdout.write(f"Processed {done} files..."),
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Done! Rendered previews for {total} files"))
@@ -0,0 +1,112 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import (
+    claim_jobs,
+    finish_job,
+    new_worker_id,
+    requeue_stale_jobs,
+    run_job,
+    schedule_periodic_jobs,
+)
+
+# Seconds between requeueing lost jobs and queueing periodic ones
+HOUSEKEEPING_INTERVAL = 30
+
+
+def _init_process():
+    if not apps.ready:
+        django.setup()
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="Jobs run at the same time",
+        )
+        parser.add_argument(
+            "--processes",
+            action="store_true",
+            help="Run jobs in worker processes instead of threads (for CPU-heavy tasks)",
+        )
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit once no jobs are due")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        poll = options["poll_interval"]
+        worker_id = new_worker_id()
+        self.stopping = False
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if options["processes"]:
+            # Forked workers must not share the parent's open database connection
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=concurrency, initializer=_init_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+
+        self.stdout.write(f"Worker {worker_id} running {concurrency} jobs at a time")
+        running = {}
+        done_count = failed_count = 0
+        next_housekeeping = 0
+
+        with executor:
+            while not self.stopping:
+                if time.monotonic() >= next_housekeeping:
+                    requeue_stale_jobs()
+                    schedule_periodic_jobs()
+                    next_housekeeping = time.monotonic() + HOUSEKEEPING_INTERVAL
+
+                free = concurrency - len(running)
+                if free > 0:
+                    for job in claim_jobs(worker_id, free):
+                        running[executor.submit(run_job, job.name, job.payload)] = job
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(poll)
+                    continue
+
+                finished, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    error = self.record(running.pop(future), future)
+                    done_count += error is None
+                    failed_count += error is not None
+
+            # Let jobs already started finish and record their results
+            for future in list(running):
+                error = self.record(running.pop(future), future)
+                done_count += error is None
+                failed_count += error is not None
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Worker stopped: {done_count} jobs done, {failed_count} failed"))
+
+    def record(self, job, future):
+        try:
+            error = future.result()
+        except Exception as exc:
+            # The pool itself broke, e.g. a worker process was killed
+            error = f"{type(exc).__name__}: {exc}"
+        finish_job(job, error)
+        if error is not None:
+            self.stderr.write(f"Job {job.name} #{job.pk} failed (attempt {job.attempts}/{job.max_attempts})")
+        return error
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.stress import profiles, run_stress
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a scratch SQLite database from several processes at once and compare "
+        "throughput and lock errors between the default and the configured connection settings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8, help="Processes writing at the same time")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds each profile runs for")
+        parser.add_argument("--read-share", type=float, default=0.5, help="Fraction of operations that are feed reads")
+        parser.add_argument("--uploads", type=int, default=2000, help="Uploads to seed the scratch database with")
+        parser.add_argument("--profiles", default="", help="Comma-separated profiles to run (default: all)")
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options["profiles"].split(",") if name.strip()] or None
+        unknown = set(names or []) - set(profiles())
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}; choose from {', '.join(profiles())}")
+        if options["processes"] < 1 or not 0 <= options["read_share"] <= 1:
+            raise CommandError("--processes must be at least 1 and --read-share between 0 and 1")
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"{options['processes']} processes, {options['duration']:g}s per profile, "
+                f"{options['read_share']:.0%} reads"
+            )
+        )
+        run_stress(
+            processes=options["processes"],
+            duration=options["duration"],
+            read_share=options["read_share"],
+            uploads=options["uploads"],
+            names=names,
+            progress=self.report,
+        )
+        self.stdout.write(self.style.SUCCESS("✅ Stress test finished"))
+
+    def report(self, name, summary):
+        line = (
+            f"  {name:<10} writes/s {summary['writes_per_s']:>8.1f}  reads/s {summary['reads_per_s']:>8.1f}  "
+            f"locked {summary['locked_errors']:>5} ({summary['locked_rate']:.1%})  "
+            f"write p50 {summary['p50_write_ms'] or 0:>7.2f} ms  p95 {summary['p95_write_ms'] or 0:>7.2f} ms  "
+            f"max {summary['max_write_ms'] or 0:>8.2f} ms"
+        )
+        failed = summary["locked_errors"] or summary["other_errors"]
+        self.stdout.write(self.style.WARNING(line) if failed else line)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replicas import sqlite_replicas, sync_replica
+
+
+class Command(BaseCommand):
+    help = "Copy the default database into its SQLite read replicas (DATABASE_REPLICAS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alias", action="append", help="Only this replica alias (repeatable)")
+        parser.add_argument("--every", type=float, help="Keep running, copying every this many seconds")
+
+    def handle(self, *args, **options):
+        replicas = sqlite_replicas()
+        aliases = options["alias"] or replicas
+        unknown = set(aliases) - set(replicas)
+        if unknown:
+            raise CommandError(f"Not SQLite replicas in DATABASE_REPLICAS: {', '.join(sorted(unknown))}")
+        if not aliases:
+            self.stdout.write(self.style.WARNING("No SQLite replicas configured; nothing to do"))
+            return
+
+        while True:
+            started = time.monotonic()
+            for alias in aliases:
+                sync_replica(alias)
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(f"✅ Synced {', '.join(aliases)} in {elapsed:.2f}s"))
+            if not options["every"]:
+                break
+            time.sleep(max(0.0, options["every"] - elapsed))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.catalog import warm_catalog
+from core.feed import first_feed_page
+from core.points import leaderboard_first_page
+
+
+class Command(BaseCommand):
+    help = "Fill the shared cache with the catalog, the leaderboard and the first feed pages, e.g. after a deploy"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subjects",
+            action="store_true",
+            help="Also warm the first feed page of every subject, not just each branch and semester",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        catalog = warm_catalog()
+        leaderboard_first_page(refresh=True)
+
+        empty = {"branch": "", "semester": "", "subject": "", "type": "", "sort": ""}
+        pages = [empty, {**empty, "sort": "trending"}, {**empty, "sort": "top"}]
+        for branch in catalog.branches:
+            pages.append({**empty, "branch": str(branch["id"])})
+            for semester in catalog.semesters:
+                pages.append({**empty, "branch": str(branch["id"]), "semester": str(semester["id"])})
+        if options["subjects"]:
+            pages += [
+                {
+                    **empty,
+                    "branch": str(s["branch_id"]),
+                    "semester": str(s["semester_id"]),
+                    "subject": str(s["id"]),
+                }
+                for s in catalog.subjects
+            ]
+        for filters in pages:
+            first_feed_page(filters, refresh=True)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Cache warmed: catalog, leaderboard and {len(pages)} feed pages in {time.monotonic() - start:.2f}s"
+            )
+        )
@@ -0,0 +1,236 @@
+"""
+Per-request cost accounting.
+
+RequestMetricsMiddleware times each request and breaks the time down into:
+
+- database queries, counted and timed with connection.execute_wrapper
+- template rendering
+- calls to the default file storage
+
+The breakdown is sent back in a Server-Timing header and added to
+per-view histograms. metrics_text() renders those in the Prometheus text
+format. With METRICS_SLOW_QUERY_MS set, any query slower than that is logged
+to "core.slow_queries" with its SQL and the code that ran it.
+
+Histograms live in each process's memory, so every web worker reports its
+own totals. Database time spent while a template runs (lazy querysets) is
+counted under both the database and the template.
+"""
+import logging
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import empty
+
+slow_query_logger = logging.getLogger("core.slow_queries")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+STORAGE_METHODS = ("open", "save", "delete", "exists", "size", "url", "listdir", "get_modified_time")
+
+_current = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "template_time", "storage_time", "storage_calls")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.storage_time = 0.0
+        self.storage_calls = 0
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# name -> (help, buckets); each is kept per view name
+HISTOGRAMS = {
+    "request_duration_seconds": ("Total time spent handling the request", DURATION_BUCKETS),
+    "db_queries": ("Database queries run by the request", QUERY_COUNT_BUCKETS),
+    "db_duration_seconds": ("Time spent in database queries", DURATION_BUCKETS),
+    "template_duration_seconds": ("Time spent rendering templates", DURATION_BUCKETS),
+    "storage_duration_seconds": ("Time spent in file storage calls", DURATION_BUCKETS),
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_responses = {}
+
+
+def record(view, status, total, stats):
+    values = {
+        "request_duration_seconds": total,
+        "db_queries": stats.queries,
+        "db_duration_seconds": stats.db_time,
+        "template_duration_seconds": stats.template_time,
+        "storage_duration_seconds": stats.storage_time,
+    }
+    with _lock:
+        for name, value in values.items():
+            key = (name, view)
+            if key not in _histograms:
+                _histograms[key] = Histogram(HISTOGRAMS[name][1])
+            _histograms[key].observe(value)
+        key = (view, f"{status // 100}xx")
+        _responses[key] = _responses.get(key, 0) + 1
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _responses.clear()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def metrics_text():
+    """Everything recorded so far in this process, in Prometheus text format."""
+    prefix = settings.METRICS_PREFIX
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        responses = sorted(_responses.items())
+
+    lines.append(f"# HELP {prefix}_responses_total Responses sent, by view and status class")
+    lines.append(f"# TYPE {prefix}_responses_total counter")
+    for (view, status), count in responses:
+        lines.append(f'{prefix}_responses_total{{view="{_label(view)}",status="{status}"}} {count}')
+
+    for name, (help_text, _) in HISTOGRAMS.items():
+        metric = f"{prefix}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (hist_name, view), hist in histograms:
+            if hist_name != name:
+                continue
+            view = _label(view)
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{view="{view}",le="+Inf"}} {hist.count}')
+            lines.append(f'{metric}_sum{{view="{view}"}} {hist.sum:.6f}')
+            lines.append(f'{metric}_count{{view="{view}"}} {hist.count}')
+    return "\n".join(lines) + "\n"
+
+
+def _app_stack():
+    # Only this project's frames, to show which code ran the query
+    frames = traceback.extract_stack()[:-3]
+    base = str(settings.BASE_DIR)
+    ours = [
+        f for f in frames
+        if f.filename.startswith(base) and f.filename != __file__ and "site-packages" not in f.filename
+    ] or frames[-5:]
+    return "".join(traceback.format_list(ours))
+
+
+def _query_timer(execute, sql, params, many, context):
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        threshold = settings.METRICS_SLOW_QUERY_MS
+        if threshold is not None and elapsed * 1000 >= threshold:
+            slow_query_logger.warning(
+                "Slow query (%.1f ms): %s\n%s", elapsed * 1000, sql, _app_stack()
+            )
+
+
+def _timed(func, field):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            setattr(stats, field, getattr(stats, field) + time.perf_counter() - start)
+            if field == "storage_time":
+                stats.storage_calls += 1
+
+    wrapper.metrics_timed = True
+    return wrapper
+
+
+def install():
+    """Wrap template rendering and the default storage so requests can time them. Safe to call twice."""
+    from django.core.files.storage import default_storage
+    from django.template.backends.django import Template
+
+    if not getattr(Template.render, "metrics_timed", False):
+        # The backend's Template is only used for top-level renders, so includes aren't counted twice
+        Template.render = _timed(Template.render, "template_time")
+
+    if default_storage._wrapped is empty:
+        default_storage._setup()
+    storage = default_storage._wrapped
+    for name in STORAGE_METHODS:
+        method = getattr(storage, name, None)
+        if method is not None and not getattr(method, "metrics_timed", False):
+            setattr(storage, name, _timed(method, "storage_time"))
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_query_timer))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        record(view, response.status_code, total, stats)
+
+        if settings.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = ", ".join(
+                [
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+                    f"tpl;dur={stats.template_time * 1000:.1f}",
+                    f'storage;dur={stats.storage_time * 1000:.1f};desc="{stats.storage_calls} calls"',
+                    f"total;dur={total * 1000:.1f}",
+                ]
+            )
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_balances(apps, schema_editor):
+    PointsLog = apps.get_model("core", "PointsLog")
+    UserPoints = apps.get_model("core", "UserPoints")
+
+    totals = PointsLog.objects.values("user_id").annotate(total=Sum("points_change")).order_by()
+    UserPoints.objects.bulk_create(
+        [UserPoints(user_id=t["user_id"], points=t["total"] or 0) for t in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_pointslog_rating_report'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPoints',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='points_balance', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('points', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_branch_semester(apps, schema_editor):
+    Subject = apps.get_model("core", "Subject")
+    Upload = apps.get_model("core", "Upload")
+
+    subject = Subject.objects.filter(pk=OuterRef("subject_id"))
+    Upload.objects.update(
+        branch=Subquery(subject.values("branch_id")[:1]),
+        semester=Subquery(subject.values("semester_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_userpoints_rank_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='branch',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.branch'),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='semester',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.semester'),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='listed',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status__in=['VERIFIED', 'UNVERIFIED'], then=models.Value(True)), default=models.Value(False)), output_field=models.BooleanField()),
+        ),
+        migrations.RunPython(backfill_branch_semester, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['-created_at', '-id'], name='upload_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['branch', '-created_at', '-id'], name='upload_feed_b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['semester', '-created_at', '-id'], name='upload_feed_s_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['branch', 'semester', '-created_at', '-id'], name='upload_feed_bs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['subject', '-created_at', '-id'], name='upload_feed_sub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['upload_type', '-created_at', '-id'], name='upload_feed_t_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['branch', 'upload_type', '-created_at', '-id'], name='upload_feed_bt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['semester', 'upload_type', '-created_at', '-id'], name='upload_feed_st_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['branch', 'semester', 'upload_type', '-created_at', '-id'], name='upload_feed_bst_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['subject', 'upload_type', '-created_at', '-id'], name='upload_feed_subt_idx'),
+        ),
+    ]
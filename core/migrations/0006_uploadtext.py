@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_upload_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadText',
+            fields=[
+                ('upload', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='core.upload')),
+                ('content', models.TextField(blank=True)),
+                ('pages', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
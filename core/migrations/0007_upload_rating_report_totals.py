@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Upload = apps.get_model("core", "Upload")
+    Rating = apps.get_model("core", "Rating")
+    Report = apps.get_model("core", "Report")
+
+    def per_upload(model, aggregate):
+        rows = model.objects.filter(upload=OuterRef("pk")).order_by().values("upload")
+        return Coalesce(Subquery(rows.annotate(total=aggregate).values("total")), 0)
+
+    Upload.objects.update(
+        rating_sum=per_upload(Rating, Sum("stars")),
+        rating_count=per_upload(Rating, Count("*")),
+        report_count=per_upload(Report, Count("*")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_uploadtext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='report_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
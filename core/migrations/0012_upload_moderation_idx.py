@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(fields=['status', '-report_count', 'created_at', 'id'], name='upload_moderation_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_upload_moderation_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='upload',
+            name='status',
+            field=models.CharField(choices=[('UNVERIFIED', 'Unverified'), ('VERIFIED', 'Verified'), ('REMOVED', 'Removed'), ('HIDDEN', 'Hidden')], default='UNVERIFIED', max_length=20),
+        ),
+    ]
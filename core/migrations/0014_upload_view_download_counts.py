@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_upload_hidden_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='download_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
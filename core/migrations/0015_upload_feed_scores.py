@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_upload_view_download_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='top_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['-trending_score', '-id'], name='upload_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('listed', True)), fields=['-top_score', '-id'], name='upload_top_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:12
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def baseline_reviewed(apps, schema_editor):
+    # Verified and removed uploads were last set by a moderator, so treat their reports as seen
+    Upload = apps.get_model("core", "Upload")
+    Upload.objects.filter(status__in=["VERIFIED", "REMOVED"]).update(reviewed_report_count=F("report_count"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_upload_feed_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='reviewed_report_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(baseline_reviewed, migrations.RunPython.noop),
+    ]
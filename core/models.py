@@ -1,4 +1,7 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -27,6 +30,40 @@ class Subject(models.Model):
     def __str__(self):
         return f"{self.branch} - Sem {self.semester.number} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the copies on Upload in step if a subject is moved
+        Upload.objects.filter(subject=self).exclude(branch=self.branch_id, semester=self.semester_id).update(
+            branch=self.branch_id, semester=self.semester_id
+        )
+
+
+# Statuses listed on the home feed
+FEED_STATUSES = ["VERIFIED", "UNVERIFIED"]
+
+
+def feed_index(name, *fields):
+    # Partial on `listed`, so each filter combination is one index range already in feed order
+    return models.Index(fields=[*fields, "-created_at", "-id"], name=name, condition=models.Q(listed=True))
+
+
+class Blob(models.Model):
+    # File contents stored once per SHA-256, shared by every Upload with those bytes
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # First-page images rendered by core.previews, named after the blob so they never change
+    thumbnail = models.FileField(max_length=255, blank=True)
+    preview = models.FileField(max_length=255, blank=True)
+    preview_error = models.CharField(max_length=200, blank=True)
+    previews_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
 
 class Upload(models.Model):
     TYPE_CHOICES = [
@@ -40,24 +77,124 @@ class Upload(models.Model):
         ("UNVERIFIED", "Unverified"),
         ("VERIFIED", "Verified"),
         ("REMOVED", "Removed"),
+        # Taken down automatically by reports, waiting for a moderator
+        ("HIDDEN", "Hidden"),
     ]
 
     uploader = models.ForeignKey(User, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
 
+    # Copied from subject on save so feed filters don't go through the join
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, editable=False)
+    semester = models.ForeignKey(Semester, on_delete=models.CASCADE, null=True, editable=False)
+
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
 
-    file = models.FileField(upload_to="uploads/")
+    file = models.FileField(upload_to="uploads/", max_length=255)
+    # Set for every new upload; file.name then points at the blob's bytes
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, editable=False, related_name="uploads")
     upload_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="UNVERIFIED")
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Running totals maintained by core.ratings, so pages never aggregate Rating/Report
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    report_count = models.PositiveIntegerField(default=0)
+    # report_count when a moderator last set the status; only reports since then count towards auto-hiding
+    reviewed_report_count = models.PositiveIntegerField(default=0)
+
+    # Buffered by core.counters and added in batches, so they trail the live count by up to COUNTER_FLUSH_SECONDS
+    view_count = models.PositiveIntegerField(default=0)
+    download_count = models.PositiveIntegerField(default=0)
+
+    # Rewritten for every listed upload by core.ranking; they order the "trending" and "top" feed sorts
+    trending_score = models.FloatField(default=0)
+    top_score = models.FloatField(default=0)
+
+    # Computed by the database so bulk status updates can't leave it stale
+    listed = models.GeneratedField(
+        expression=models.Case(
+            models.When(status__in=FEED_STATUSES, then=models.Value(True)),
+            default=models.Value(False),
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        # One index per filter combination the home feed supports
+        indexes = [
+            feed_index("upload_feed_idx"),
+            feed_index("upload_feed_b_idx", "branch"),
+            feed_index("upload_feed_s_idx", "semester"),
+            feed_index("upload_feed_bs_idx", "branch", "semester"),
+            feed_index("upload_feed_sub_idx", "subject"),
+            feed_index("upload_feed_t_idx", "upload_type"),
+            feed_index("upload_feed_bt_idx", "branch", "upload_type"),
+            feed_index("upload_feed_st_idx", "semester", "upload_type"),
+            feed_index("upload_feed_bst_idx", "branch", "semester", "upload_type"),
+            feed_index("upload_feed_subt_idx", "subject", "upload_type"),
+            # The score sorts, unfiltered; filtered ones sort the filter's index range, which is small
+            models.Index(
+                fields=["-trending_score", "-id"], name="upload_trending_idx", condition=models.Q(listed=True)
+            ),
+            models.Index(fields=["-top_score", "-id"], name="upload_top_idx", condition=models.Q(listed=True)),
+            # Moderation queue order: most reported first, then oldest
+            models.Index(fields=["status", "-report_count", "created_at", "id"], name="upload_moderation_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.get_upload_type_display()})"
 
+    @property
+    def avg_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    def save(self, *args, **kwargs):
+        if self.subject_id:
+            self.branch_id = self.subject.branch_id
+            self.semester_id = self.subject.semester_id
+        super().save(*args, **kwargs)
+
+
+class ChunkedUpload(models.Model):
+    # An upload in progress: metadata from init, bytes acknowledged so far in `offset`
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    upload_type = models.CharField(max_length=20, choices=Upload.TYPE_CHOICES)
+
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
+class UploadText(models.Model):
+    # Plain text pulled out of the uploaded file, fed to the search index
+    upload = models.OneToOneField(Upload, on_delete=models.CASCADE, primary_key=True, related_name="text")
+    content = models.TextField(blank=True)
+    pages = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=200, blank=True)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Text of upload {self.upload_id} ({self.pages} pages)"
+
 
 class Rating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -99,3 +236,49 @@ class PointsLog(models.Model):
 
     def __str__(self):
         return f"{self.user.username}: {self.action} ({self.points_change})"
+
+
+class UserPoints(models.Model):
+    # Running balance of PointsLog.points_change, kept in step by core.points.add_points
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="points_balance")
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        # Leaderboard order: highest points first, ties broken by user id
+        indexes = [models.Index(fields=["-points", "user"], name="userpoints_rank_idx")]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.points}"
+
+
+class Job(models.Model):
+    # Background work run by `manage.py run_worker`; see core.jobs
+    STATUS_CHOICES = [
+        ("QUEUED", "Queued"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="QUEUED")
+    # Set for jobs that must only be queued once, e.g. one run per periodic slot
+    unique_key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Workers claim the oldest due QUEUED jobs first
+        indexes = [models.Index(fields=["status", "run_at", "id"], name="job_ready_idx")]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
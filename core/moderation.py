@@ -0,0 +1,115 @@
+"""
+The moderation queue: UNVERIFIED uploads, most reported first and then oldest,
+paged by keyset over upload_moderation_idx. Status changes are applied to
+any number of uploads in one UPDATE.
+"""
+from django.db.models import Count, F, Max, Q
+from django.utils.dateparse import parse_datetime
+
+from .feed import bump_feed_generations
+from .models import Report, Upload
+
+MODERATION_PAGE_SIZE = 50
+# Most uploads one moderation request may change
+MODERATION_MAX_BATCH = 500
+
+TRIAGE_PAGE_SIZE = 50
+
+MODERATION_ACTIONS = {
+    "verify": "VERIFIED",
+    "remove": "REMOVED",
+}
+
+
+def parse_moderation_cursor(cursor):
+    """Turn a decoded [report_count, created_at, id] cursor back into typed values."""
+    if not cursor:
+        return None
+    report_count, created_at, pk = cursor
+    created_at = parse_datetime(str(created_at))
+    if created_at is None or not str(report_count).isdigit() or not str(pk).isdigit():
+        return None
+    return int(report_count), created_at, int(pk)
+
+
+def _after(report_count, created_at, pk):
+    # Rows after the cursor in (-report_count, created_at, id) order; the
+    # leading report_count__lte bounds the index range scan
+    return Q(report_count__lte=report_count) & (
+        Q(report_count__lt=report_count)
+        | Q(created_at__gt=created_at)
+        | Q(created_at=created_at, id__gt=pk)
+    )
+
+
+def moderation_page(cursor=None, limit=MODERATION_PAGE_SIZE):
+    """
+    One page of the queue after `cursor` ((report_count, created_at, id) of
+    the previous page's last row). Returns (items, next_cursor); next_cursor
+    is None on the last page.
+    """
+    qs = (
+        Upload.objects.filter(status="UNVERIFIED")
+        .select_related("subject", "branch", "semester", "uploader")
+        .order_by("-report_count", "created_at", "id")
+    )
+    if cursor:
+        qs = qs.filter(_after(*cursor))
+
+    items = list(qs[: limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        last = items[limit - 1]
+        next_cursor = [last.report_count, last.created_at.isoformat(), last.pk]
+    return items[:limit], next_cursor
+
+
+def set_status(ids, status):
+    """
+    Move the uploads in `ids` to `status` in a single UPDATE of that column.
+
+    Every selected upload's reports so far count as reviewed, so auto-hiding
+    starts over from zero, even for uploads that already had `status`.
+    Returns (uploads reviewed, uploads whose status changed).
+    """
+    ids = [int(pk) for pk in ids if str(pk).isdigit()][:MODERATION_MAX_BATCH]
+    if not ids:
+        return 0, 0
+    selected = Upload.objects.filter(pk__in=ids)
+    moving = list(selected.exclude(status=status).values_list("pk", "subject_id", "branch_id", "semester_id"))
+    changed = 0
+    if moving:
+        changed = selected.filter(pk__in=[row[0] for row in moving]).exclude(status=status).update(status=status)
+        # .update() sends no signals
+        bump_feed_generations([row[1:] for row in moving])
+    reviewed = selected.update(reviewed_report_count=F("report_count"))
+    return reviewed, changed
+
+
+def reason_field(reason):
+    return f"reports_{reason.lower()}"
+
+
+def report_triage(reason="", status=""):
+    """
+    Reported uploads, one row each, newest report first.
+
+    Every row is annotated with a count per report reason (reports_spam,
+    reports_wrong, ...) and latest_report, all from one grouped query.
+    `reason` keeps uploads with at least one report of that reason.
+    """
+    qs = Upload.objects.filter(report_count__gt=0)
+    if reason:
+        qs = qs.filter(pk__in=Report.objects.filter(reason=reason).values("upload_id"))
+    if status:
+        qs = qs.filter(status=status)
+
+    per_reason = {
+        reason_field(code): Count("report", filter=Q(report__reason=code))
+        for code, _ in Report.REASON_CHOICES
+    }
+    return (
+        qs.select_related("subject", "uploader")
+        .annotate(latest_report=Max("report__created_at"), **per_reason)
+        .order_by("-latest_report", "-id")
+    )
@@ -0,0 +1,22 @@
+import base64
+import json
+
+
+def encode_cursor(values):
+    """Pack the sort key of the last row on a page into an opaque URL-safe token."""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """Return the sort key packed by encode_cursor, or None if the token is missing or bad."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
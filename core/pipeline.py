@@ -0,0 +1,18 @@
+"""
+Hooks that queue background work for things that happen in requests.
+
+Each hook only inserts Job rows in the current transaction; the work itself
+is done by `manage.py run_worker` (see core.jobs and core.tasks).
+"""
+from .jobs import enqueue
+
+
+def schedule_post_upload(upload_id):
+    enqueue("render_previews", {"upload_id": upload_id})
+    enqueue("extract_text", {"upload_id": upload_id})
+
+
+def schedule_post_delete(names):
+    """Delete stored files once the rows that used them are gone."""
+    if names:
+        enqueue("delete_files", {"names": list(names)})
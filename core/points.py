@@ -0,0 +1,143 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+
+from .models import PointsLog, UserPoints
+
+
+def add_points(user, action, points):
+    """Append to the ledger and move the cached balance in the same transaction."""
+    with transaction.atomic():
+        PointsLog.objects.create(user=user, action=action, points_change=points)
+
+        if UserPoints.objects.filter(user=user).update(points=F("points") + points):
+            return
+
+        try:
+            with transaction.atomic():
+                UserPoints.objects.create(user=user, points=points)
+        except IntegrityError:
+            # Another request created the row first
+            UserPoints.objects.filter(user=user).update(points=F("points") + points)
+
+
+def get_user_points(user):
+    return _balance(user) or 0
+
+
+def _balance(user):
+    return UserPoints.objects.filter(user=user).values_list("points", flat=True).first()
+
+
+def reconcile_balances(batch_size=1000):
+    """
+    Rebuild every balance from PointsLog. Returns the number of balances written.
+
+    Each batch of `batch_size` users is totalled in the transaction that
+    writes it, so an add_points() that commits meanwhile is never overwritten
+    by a total read before it.
+    """
+    UserPoints.objects.exclude(user_id__in=PointsLog.objects.values("user_id")).delete()
+
+    written = last_user_id = 0
+    while True:
+        with transaction.atomic():
+            totals = list(
+                PointsLog.objects.filter(user_id__gt=last_user_id)
+                .values("user_id")
+                .annotate(total=Sum("points_change"))
+                .order_by("user_id")[:batch_size]
+            )
+            if not totals:
+                return written
+            UserPoints.objects.bulk_create(
+                [UserPoints(user_id=t["user_id"], points=t["total"] or 0) for t in totals],
+                update_conflicts=True,
+                unique_fields=["user"],
+                update_fields=["points"],
+            )
+        written += len(totals)
+        last_user_id = totals[-1]["user_id"]
+
+
+# -------------------------
+# Leaderboard
+# -------------------------
+LEADERBOARD_PAGE_SIZE = 50
+LEADERBOARD_CACHE_KEY = "leaderboard:first"
+# The first page is shared between workers for this long
+LEADERBOARD_CACHE_TIMEOUT = 60
+
+
+def _leaderboard_row(points, user_id, username, rank):
+    return {"rank": rank, "user_id": user_id, "username": username, "points": points}
+
+
+def leaderboard_page(cursor=None, limit=LEADERBOARD_PAGE_SIZE):
+    """
+    One page of the leaderboard, walking userpoints_rank_idx from `cursor`.
+
+    `cursor` is (points, user_id, rank) of the last row on the previous page.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    qs = UserPoints.objects.order_by("-points", "user_id")
+    rank = 0
+    if cursor:
+        points, user_id, rank = cursor
+        qs = qs.filter(_behind(points, user_id))
+
+    fetched = list(qs.values_list("points", "user_id", "user__username")[: limit + 1])
+    rows = [_leaderboard_row(*r, rank + i) for i, r in enumerate(fetched[:limit], start=1)]
+
+    next_cursor = None
+    if len(fetched) > limit:
+        last = rows[-1]
+        next_cursor = (last["points"], last["user_id"], last["rank"])
+    return rows, next_cursor
+
+
+def leaderboard_first_page(refresh=False):
+    """leaderboard_page() for the first page, from the shared cache; `refresh` rebuilds it."""
+    if refresh:
+        page = leaderboard_page()
+        cache.set(LEADERBOARD_CACHE_KEY, page, LEADERBOARD_CACHE_TIMEOUT)
+        return page
+    return cache.get_or_set(LEADERBOARD_CACHE_KEY, leaderboard_page, LEADERBOARD_CACHE_TIMEOUT)
+
+
+def _ahead_of(points, user_id):
+    # Everyone ranked above (points, user_id); a range over userpoints_rank_idx
+    return Q(points__gte=points) & (Q(points__gt=points) | Q(user_id__lt=user_id))
+
+
+def _behind(points, user_id):
+    return Q(points__lte=points) & (Q(points__lt=points) | Q(user_id__gt=user_id))
+
+
+def rank_neighbours(user, around=2):
+    """
+    The user's row with up to `around` rows either side of it, in rank order.
+
+    Returns an empty list if the user has no balance yet.
+    """
+    points = _balance(user)
+    if points is None:
+        return []
+
+    rank = UserPoints.objects.filter(_ahead_of(points, user.pk)).count() + 1
+
+    above = list(
+        UserPoints.objects.filter(_ahead_of(points, user.pk))
+        .order_by("points", "-user_id")
+        .values_list("points", "user_id", "user__username")[:around]
+    )
+    below = list(
+        UserPoints.objects.filter(_behind(points, user.pk))
+        .order_by("-points", "user_id")
+        .values_list("points", "user_id", "user__username")[:around]
+    )
+
+    rows = [_leaderboard_row(*r, rank - i) for i, r in enumerate(above, start=1)][::-1]
+    rows.append(_leaderboard_row(points, user.pk, user.username, rank))
+    rows += [_leaderboard_row(*r, rank + i) for i, r in enumerate(below, start=1)]
+    return rows
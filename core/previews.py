@@ -0,0 +1,162 @@
+"""
+First-page thumbnails and previews for uploaded files.
+
+Images are rendered once per Blob and stored next to it as
+blobs/<aa>/<sha256>.thumb.webp and .preview.webp. The names are derived from
+the contents, so their URLs never change and can be cached forever. They are
+served by the preview_image view, which serves nothing but these names; the
+original files in the same directories only go out through the note views. As with
+text extraction, backlogs are rendered on a process pool; workers write the
+images to storage and the parent records them on the Blob rows in bulk.
+"""
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import pypdfium2 as pdfium
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .feed import bump_uploads_generations
+from .models import Blob, Upload
+
+THUMBNAIL_WIDTH = 320
+PREVIEW_WIDTH = 1000
+WEBP_QUALITY = 75
+BATCH_SIZE = 50
+
+NOT_A_PDF = "Not a PDF"
+
+PREVIEW_FIELDS = ["thumbnail", "preview", "preview_error", "previews_at"]
+
+# Exactly the names preview_names() gives out
+PREVIEW_NAME = re.compile(r"^blobs/(?P<prefix>[0-9a-f]{2})/(?P=prefix)[0-9a-f]{62}\.(?:thumb|preview)\.webp$")
+
+
+def preview_names(sha256):
+    prefix = f"blobs/{sha256[:2]}/{sha256}"
+    return f"{prefix}.thumb.webp", f"{prefix}.preview.webp"
+
+
+def render_first_page(fileobj, width=PREVIEW_WIDTH):
+    """Render page one of a PDF to a PIL image `width` pixels wide."""
+    pdf = pdfium.PdfDocument(fileobj)
+    try:
+        page = pdf[0]
+        bitmap = page.render(scale=width / page.get_width())
+        return bitmap.to_pil().convert("RGB")
+    finally:
+        pdf.close()
+
+
+def _webp(image):
+    buf = io.BytesIO()
+    image.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+    return ContentFile(buf.getvalue())
+
+
+def _save(name, image):
+    # Same bytes always give the same image, so an existing file is already correct
+    if not default_storage.exists(name):
+        name = default_storage.save(name, _webp(image))
+    return name
+
+
+def render_blob_previews(sha256, name):
+    """Render and store the images for one blob. Returns its preview field values."""
+    row = {"sha256": sha256, "thumbnail": "", "preview": "", "preview_error": ""}
+    if not name.lower().endswith(".pdf"):
+        row["preview_error"] = NOT_A_PDF
+        return row
+
+    thumbnail_name, preview_name = preview_names(sha256)
+    try:
+        with default_storage.open(name, "rb") as fh:
+            image = render_first_page(fh)
+        row["preview"] = _save(preview_name, image)
+        image.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 2))
+        row["thumbnail"] = _save(thumbnail_name, image)
+    except Exception as exc:
+        row["preview_error"] = f"{type(exc).__name__}: {exc}"[:200]
+    return row
+
+
+def save_previews(rows):
+    now = timezone.now()
+    blobs = [Blob(pk=row.pop("sha256"), previews_at=now, **row) for row in rows]
+    Blob.objects.bulk_update(blobs, PREVIEW_FIELDS)
+    # Feed cards show the thumbnail
+    bump_uploads_generations(Upload.objects.filter(blob__in=[blob.pk for blob in blobs]))
+
+
+def previews_for_upload(upload_id):
+    """Render the images for a single upload's blob in this process, if it has none yet."""
+    blob = (
+        Blob.objects.filter(uploads=upload_id, previews_at__isnull=True)
+        .values_list("sha256", "file")
+        .first()
+    )
+    if blob:
+        save_previews([render_blob_previews(*blob)])
+
+
+def pending_blobs(retry_failed=False):
+    pending = Q(previews_at__isnull=True)
+    if retry_failed:
+        pending |= ~Q(preview_error="") & ~Q(preview_error=NOT_A_PDF)
+    return Blob.objects.filter(pending, ref_count__gt=0).order_by("sha256")
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _render_row(row):
+    return render_blob_previews(*row)
+
+
+def render_pending(workers=None, batch_size=BATCH_SIZE, limit=None, retry_failed=False, progress=None):
+    """
+    Render images for every blob that has none yet, `batch_size` rows per write.
+
+    Safe to interrupt; the next run picks up whatever is still pending.
+    Returns the number of blobs processed.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk = batch_size * workers
+    done = 0
+    last_sha = ""
+
+    # Forked workers must not share the parent's open database connection
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while limit is None or done < limit:
+            size = chunk if limit is None else min(chunk, limit - done)
+            rows = list(
+                pending_blobs(retry_failed).filter(sha256__gt=last_sha).values_list("sha256", "file")[:size]
+            )
+            if not rows:
+                break
+            last_sha = rows[-1][0]
+
+            batch = []
+            for row in pool.map(_render_row, rows, chunksize=2):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    save_previews(batch)
+                    done += len(batch)
+                    batch = []
+            if batch:
+                save_previews(batch)
+                done += len(batch)
+
+            if progress:
+                progress(done)
+    return done
@@ -0,0 +1,110 @@
+"""
+Scores for the "trending" and "top" feed sorts.
+
+update_scores() reads the rating totals, counters and age of every listed
+upload into NumPy arrays, scores them all in a handful of array operations
+and writes the results to Upload.trending_score and Upload.top_score. Those
+columns are indexed in feed order, so the score sorts page the same way
+"newest" does. Trending scores fade as uploads age, so the job queue reruns
+this every JOB_PERIODIC["recompute_scores"] seconds.
+
+- top: the Bayesian average rating. Each upload's ratings are pooled with
+  PRIOR_WEIGHT ratings at the site-wide mean, so two 5-star ratings don't
+  outrank two hundred 4.8s.
+- trending: engagement (views, downloads and ratings, on a log scale) times
+  the Bayesian rating as a fraction of 5, halved for every HALF_LIFE_HOURS
+  of age.
+
+Uploads that go live between runs score 0 until the next one.
+"""
+import time
+
+import numpy as np
+from django.db import connection, transaction
+
+from .feed import bump_scores_version
+from .models import Upload
+
+# How many ratings at the site-wide mean each upload starts with
+PRIOR_WEIGHT = 5
+# The mean to use before anything has been rated
+DEFAULT_MEAN = 3.0
+HALF_LIFE_HOURS = 72
+# Engagement counts a download as this many views, and a rating as this many
+DOWNLOAD_WEIGHT = 3
+RATING_WEIGHT = 5
+
+SCORE_BATCH_SIZE = 20000
+
+ROW_DTYPE = np.dtype(
+    [
+        ("id", np.int64),
+        ("created", np.float64),
+        ("rating_sum", np.float64),
+        ("rating_count", np.float64),
+        ("views", np.float64),
+        ("downloads", np.float64),
+    ]
+)
+
+
+def load_rows():
+    """One record per listed upload, as a structured array with ROW_DTYPE."""
+    rows = (
+        Upload.objects.filter(listed=True)
+        .order_by()
+        .values_list("id", "created_at", "rating_sum", "rating_count", "view_count", "download_count")
+        .iterator(chunk_size=SCORE_BATCH_SIZE)
+    )
+    return np.fromiter(
+        ((pk, created_at.timestamp(), *counts) for pk, created_at, *counts in rows),
+        dtype=ROW_DTYPE,
+    )
+
+
+def score(rows, now):
+    """(top, trending) score arrays for `rows` from load_rows(), as of the Unix time `now`."""
+    rated = rows["rating_count"].sum()
+    mean = rows["rating_sum"].sum() / rated if rated else DEFAULT_MEAN
+    top = (PRIOR_WEIGHT * mean + rows["rating_sum"]) / (PRIOR_WEIGHT + rows["rating_count"])
+
+    engagement = np.log1p(
+        rows["views"] + DOWNLOAD_WEIGHT * rows["downloads"] + RATING_WEIGHT * rows["rating_count"]
+    )
+    age_hours = np.maximum(now - rows["created"], 0) / 3600
+    trending = engagement * (top / 5) * np.exp2(-age_hours / HALF_LIFE_HOURS)
+    return top, trending
+
+
+def write_scores(ids, top, trending, batch_size=SCORE_BATCH_SIZE):
+    """
+    Store the scores, `batch_size` uploads per transaction.
+
+    Each batch goes into a temporary table with executemany, then onto
+    core_upload with one UPDATE ... FROM, rather than an UPDATE per row.
+    """
+    table = connection.ops.quote_name(Upload._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS upload_scores (id INTEGER PRIMARY KEY, top REAL, trending REAL)")
+        try:
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                batch = zip(ids[start:end].tolist(), top[start:end].tolist(), trending[start:end].tolist())
+                with transaction.atomic():
+                    cursor.execute("DELETE FROM upload_scores")
+                    cursor.executemany("INSERT INTO upload_scores (id, top, trending) VALUES (%s, %s, %s)", list(batch))
+                    cursor.execute(
+                        f"UPDATE {table} SET top_score = upload_scores.top, trending_score = upload_scores.trending "
+                        f"FROM upload_scores WHERE upload_scores.id = {table}.id"
+                    )
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS upload_scores")
+
+
+def update_scores(now=None, batch_size=SCORE_BATCH_SIZE):
+    """Rescore every listed upload. Returns how many were scored."""
+    rows = load_rows()
+    top, trending = score(rows, time.time() if now is None else now)
+    write_scores(rows["id"], top, trending, batch_size)
+    bump_scores_version()
+    return len(rows)
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, Exists, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .feed import bump_uploads_generations
+from .models import Rating, Report, Upload
+
+
+def rate_upload(user, upload_id, stars):
+    """
+    Record the user's rating and move the upload's running totals by the delta.
+
+    A first rating adds to rating_sum and rating_count; a re-rating only
+    shifts rating_sum by the difference from the previous stars.
+    """
+    previous = Rating.objects.filter(user=user, upload_id=upload_id)
+
+    with transaction.atomic():
+        # Update the totals first, while the previous rating is still in place
+        Upload.objects.filter(pk=upload_id).update(
+            rating_sum=F("rating_sum") + stars - Coalesce(Subquery(previous.values("stars")[:1]), 0),
+            rating_count=F("rating_count") + Case(When(Exists(previous), then=Value(0)), default=Value(1)),
+        )
+        # INSERT ... ON CONFLICT (user_id, upload_id) DO UPDATE SET stars = excluded.stars
+        Rating.objects.bulk_create(
+            [Rating(user=user, upload_id=upload_id, stars=stars)],
+            update_conflicts=True,
+            unique_fields=["user", "upload"],
+            update_fields=["stars"],
+        )
+
+
+def report_upload(user, upload_id, reason):
+    """
+    Record a report (once per user per upload) and refresh the upload's report_count.
+
+    Once REPORT_AUTO_HIDE_THRESHOLD distinct users have reported a listed
+    upload since a moderator last set its status, it is moved to HIDDEN
+    until a moderator looks at it again. Returns True if this report hid
+    the upload.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Report.objects.create(reporter=user, upload_id=upload_id, reason=reason)
+        except IntegrityError:
+            # A repeat report keeps the first reason and changes nothing
+            return False
+
+        Upload.objects.filter(pk=upload_id).update(report_count=_report_count())
+
+        threshold = settings.REPORT_AUTO_HIDE_THRESHOLD
+        if not threshold:
+            return False
+        hidden = Upload.objects.filter(
+            pk=upload_id, listed=True, report_count__gte=F("reviewed_report_count") + threshold
+        ).update(status="HIDDEN")
+        if hidden:
+            bump_uploads_generations(Upload.objects.filter(pk=upload_id))
+        return bool(hidden)
+
+
+def avg_rating_expression():
+    """Average stars as a column expression, NULL when unrated; usable in order_by()."""
+    return Cast("rating_sum", FloatField()) / NullIf("rating_count", 0)
+
+
+def _per_upload(model, aggregate):
+    # Correlated per-upload aggregate, 0 when there are no rows
+    return Coalesce(
+        Subquery(
+            model.objects.filter(upload=OuterRef("pk"))
+            .order_by()
+            .values("upload")
+            .annotate(total=aggregate)
+            .values("total")
+        ),
+        0,
+    )
+
+
+def _report_count():
+    return _per_upload(Report, Count("*"))
+
+
+def recount_upload_stats():
+    """Rebuild rating and report totals for every upload from the Rating and Report tables."""
+    return Upload.objects.update(
+        rating_sum=_per_upload(Rating, Sum("stars")),
+        rating_count=_per_upload(Rating, Count("*")),
+        report_count=_report_count(),
+    )
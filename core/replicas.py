@@ -0,0 +1,156 @@
+"""
+Read replicas.
+
+ReplicaRouter sends reads to one of the DATABASE_REPLICAS aliases and
+writes to "default". Reads stay on "default" in these cases:
+
+- inside a transaction on "default"
+- for models in PRIMARY_ONLY_MODELS
+- for the rest of a request that is not a GET/HEAD/OPTIONS
+- for a client that wrote recently
+
+For the last case, ReplicaPinningMiddleware sets a short-lived cookie on any
+response whose request wrote to the database. While the cookie lasts, that
+client reads from "default", so it sees its own change (e.g. upload_note ->
+my_uploads) even before the replicas catch up. With no replicas configured,
+everything runs on "default" and no cookie is set.
+
+A replica can be any database alias. For an SQLite replica file,
+sync_replica() copies "default" into it with SQLite's online backup API.
+"""
+import os
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PIN_COOKIE = "use_primary"
+
+# Sessions and jobs are written and read back within seconds, so lag would show
+PRIMARY_ONLY_MODELS = {"sessions.session", "core.job"}
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class _RoutingState:
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar("replica_routing", default=None)
+
+
+@contextmanager
+def use_primary():
+    """Read from "default" for the duration of the block."""
+    token = _state.set(_RoutingState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return None
+        state = _state.get()
+        if state is not None and state.pinned:
+            return "default"
+        if model._meta.label_lower in PRIMARY_ONLY_MODELS or connections["default"].in_atomic_block:
+            return "default"
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related rows come from wherever the instance itself came from
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema along with the data
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinningMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        state = _RoutingState(pinned=request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def sqlite_replicas():
+    """The DATABASE_REPLICAS aliases that are SQLite files this process can copy into."""
+    return [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if connections[alias].vendor == "sqlite" and not connections[alias].is_in_memory_db()
+    ]
+
+
+def sync_replica(alias):
+    """
+    Copy "default" into the SQLite replica `alias`.
+
+    The copy is written next to the replica and moved over it in one step,
+    so readers see either the old file or the new one, never a half-copied
+    one. Connections already open keep reading the old file until they
+    reconnect.
+    """
+    source_name = str(connections["default"].settings_dict["NAME"])
+    target_name = str(connections[alias].settings_dict["NAME"])
+    partial = f"{target_name}.partial"
+    if os.path.exists(partial):
+        # Left behind by a copy that was interrupted
+        os.remove(partial)
+
+    source = sqlite3.connect(source_name)
+    try:
+        target = sqlite3.connect(partial)
+        try:
+            # One step, so the copy is a single read transaction; in WAL mode that
+            # does not hold up writers, and a stepped copy would restart on every write
+            source.backup(target)
+            # The copy is only ever read; a rollback journal leaves no -wal file to go stale
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+    finally:
+        source.close()
+    os.replace(partial, target_name)
+    connections[alias].close()
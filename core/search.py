@@ -0,0 +1,226 @@
+"""
+Full-text search over uploads.
+
+On SQLite this is an FTS5 table keyed by Upload.id and kept in sync by
+triggers, so every write path (save, queryset.update, delete, cascades) is
+covered. Text extracted from the file itself (UploadText) is indexed as
+`body`. Feed filters are stored as tokens in an unweighted `filters` column
+and applied inside MATCH, so they narrow the index lookup itself. Other
+database backends fall back to icontains filtering.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Upload
+
+FTS_TABLE = "core_upload_fts"
+FTS_COLUMNS = ["title", "description", "subject", "body", "filters"]
+
+# bm25 column weights, in FTS_COLUMNS order
+FTS_WEIGHTS = (10.0, 2.0, 5.0, 1.0, 0.0)
+
+SEARCH_PAGE_SIZE = 24
+MAX_QUERY_TERMS = 10
+
+_FILTERS_SQL = (
+    "CASE WHEN new.listed THEN 'listed' ELSE 'unlisted' END"
+    " || ' br' || ifnull(new.branch_id, 0)"
+    " || ' se' || ifnull(new.semester_id, 0)"
+    " || ' su' || new.subject_id"
+    " || ' ty' || lower(new.upload_type)"
+)
+
+_SUBJECT_SQL = "(SELECT name FROM core_subject WHERE id = new.subject_id)"
+_BODY_SQL = "(SELECT content FROM core_uploadtext WHERE upload_id = new.id)"
+
+TRIGGERS = {
+    "core_upload_fts_ai": f"""
+        CREATE TRIGGER core_upload_fts_ai AFTER INSERT ON core_upload BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description, subject, body, filters)
+            VALUES (new.id, new.title, new.description, {_SUBJECT_SQL}, {_BODY_SQL}, {_FILTERS_SQL});
+        END
+    """,
+    "core_upload_fts_au": f"""
+        CREATE TRIGGER core_upload_fts_au
+        AFTER UPDATE OF title, description, subject_id, status, branch_id, semester_id, upload_type
+        ON core_upload BEGIN
+            UPDATE {FTS_TABLE}
+            SET title = new.title, description = new.description,
+                subject = {_SUBJECT_SQL}, filters = {_FILTERS_SQL}
+            WHERE rowid = new.id;
+        END
+    """,
+    "core_upload_fts_ad": f"""
+        CREATE TRIGGER core_upload_fts_ad AFTER DELETE ON core_upload BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    """,
+    "core_subject_fts_au": f"""
+        CREATE TRIGGER core_subject_fts_au AFTER UPDATE OF name ON core_subject BEGIN
+            UPDATE {FTS_TABLE} SET subject = new.name
+            WHERE rowid IN (SELECT id FROM core_upload WHERE subject_id = new.id);
+        END
+    """,
+    "core_uploadtext_fts_ai": f"""
+        CREATE TRIGGER core_uploadtext_fts_ai AFTER INSERT ON core_uploadtext BEGIN
+            UPDATE {FTS_TABLE} SET body = new.content WHERE rowid = new.upload_id;
+        END
+    """,
+    "core_uploadtext_fts_au": f"""
+        CREATE TRIGGER core_uploadtext_fts_au AFTER UPDATE OF content ON core_uploadtext BEGIN
+            UPDATE {FTS_TABLE} SET body = new.content WHERE rowid = new.upload_id;
+        END
+    """,
+    "core_uploadtext_fts_ad": f"""
+        CREATE TRIGGER core_uploadtext_fts_ad AFTER DELETE ON core_uploadtext BEGIN
+            UPDATE {FTS_TABLE} SET body = NULL WHERE rowid = old.upload_id;
+        END
+    """,
+}
+
+_REBUILD_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, title, description, subject, body, filters)
+    SELECT u.id, u.title, u.description, s.name, t.content,
+           CASE WHEN u.listed THEN 'listed' ELSE 'unlisted' END
+           || ' br' || ifnull(u.branch_id, 0)
+           || ' se' || ifnull(u.semester_id, 0)
+           || ' su' || u.subject_id
+           || ' ty' || lower(u.upload_type)
+    FROM core_upload u
+    JOIN core_subject s ON s.id = u.subject_id
+    LEFT JOIN core_uploadtext t ON t.upload_id = u.id
+"""
+
+
+def fts_enabled(using="default"):
+    return connections[using].vendor == "sqlite"
+
+
+def ensure_search_index(using="default"):
+    """
+    Create the FTS table and triggers if any are missing, then backfill.
+
+    Table rebuilds during SQLite migrations drop triggers, so this runs after
+    every migrate. Returns True if anything had to be (re)created.
+    """
+    if not fts_enabled(using):
+        return False
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT name FROM pragma_table_info('{FTS_TABLE}')")
+        columns = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name GLOB '*_fts_*'")
+        triggers = {row[0] for row in cursor.fetchall()}
+
+        if columns == FTS_COLUMNS and triggers == set(TRIGGERS):
+            return False
+
+        for name in triggers:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        if columns != FTS_COLUMNS:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"{', '.join(FTS_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+
+    rebuild_search_index(using)
+    return True
+
+
+def rebuild_search_index(using="default"):
+    """Repopulate the FTS table from core_upload in one statement. Returns the row count."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(_REBUILD_SQL)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query: every word must prefix-match a text column."""
+    terms = re.findall(r"\w+", text)[:MAX_QUERY_TERMS]
+    if not terms:
+        return ""
+    return "{title description subject body} : (%s)" % " ".join(f'"{term}"*' for term in terms)
+
+
+def _filter_expression(filters, listed_only):
+    tokens = []
+    if listed_only:
+        tokens.append("listed")
+    if filters.get("branch"):
+        tokens.append(f"br{filters['branch']}")
+    if filters.get("semester"):
+        tokens.append(f"se{filters['semester']}")
+    if filters.get("subject"):
+        tokens.append(f"su{filters['subject']}")
+    if filters.get("type"):
+        tokens.append(f"ty{filters['type'].lower()}")
+    return " AND ".join(f'filters : "{token}"' for token in tokens)
+
+
+def search_upload_ids(text, filters=None, listed_only=True, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Upload ids matching `text`, best match first. `filters` is as returned by feed.feed_filters."""
+    query = match_expression(text)
+    if not query:
+        return []
+
+    filters = filters or {}
+    if not fts_enabled():
+        return list(_fallback_queryset(text, filters, listed_only).values_list("id", flat=True)[offset : offset + limit])
+
+    constraint = _filter_expression(filters, listed_only)
+    if constraint:
+        query = f"{query} AND {constraint}"
+
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    with connections["default"].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s",
+            [query, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_page(text, filters=None, page=1, limit=SEARCH_PAGE_SIZE, queryset=None):
+    """
+    One page of ranked search results as Upload objects.
+
+    Returns (items, has_next).
+    """
+    ids = search_upload_ids(text, filters, limit=limit + 1, offset=(page - 1) * limit)
+    has_next = len(ids) > limit
+    ids = ids[:limit]
+
+    queryset = queryset if queryset is not None else Upload.objects.all()
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found], has_next
+
+
+def _fallback_queryset(text, filters, listed_only):
+    qs = Upload.objects.order_by("-created_at", "-id")
+    if listed_only:
+        qs = qs.filter(listed=True)
+    for term in re.findall(r"\w+", text)[:MAX_QUERY_TERMS]:
+        qs = qs.filter(
+            Q(title__icontains=term)
+            | Q(description__icontains=term)
+            | Q(subject__name__icontains=term)
+            | Q(text__content__icontains=term)
+        )
+    if filters.get("branch"):
+        qs = qs.filter(branch_id=filters["branch"])
+    if filters.get("semester"):
+        qs = qs.filter(semester_id=filters["semester"])
+    if filters.get("subject"):
+        qs = qs.filter(subject_id=filters["subject"])
+    if filters.get("type"):
+        qs = qs.filter(upload_type=filters["type"])
+    return qs
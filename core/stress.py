@@ -0,0 +1,166 @@
+"""
+Write-contention stress test for the SQLite connection settings.
+
+run_stress() builds a scratch database and seeds it. It then starts several
+processes that hammer it at the same moment with the site's own write paths
+(add_points, rate_upload, report_upload) mixed with home feed reads. It does
+this once per connection profile:
+
+- "baseline": Python's sqlite3 defaults, i.e. a rollback journal, deferred
+  transactions and a 5 second busy timeout
+- "tuned": the OPTIONS in settings.DATABASES["default"]
+
+For each profile it reports throughput, "database is locked" errors and
+write latency, so a settings change can be measured before it ships.
+"""
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from .catalog import load_catalog, read_catalog_file
+from .feed import feed_page, feed_queryset
+from .loadgen import generate_load_data
+from .models import Report, Upload
+from .points import add_points
+from .ratings import rate_upload, report_upload
+
+
+def profiles():
+    return {
+        "baseline": {"init_command": "PRAGMA journal_mode=DELETE"},
+        "tuned": dict(settings.DATABASES["default"].get("OPTIONS", {})),
+    }
+
+
+def _use_database(name, options):
+    # Connection parameters are read when the connection opens, so close it first
+    conn = connections["default"]
+    conn.close()
+    conn.settings_dict["NAME"] = name
+    conn.settings_dict["OPTIONS"] = dict(options)
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _is_locked(exc):
+    message = str(exc)
+    return "locked" in message or "busy" in message
+
+
+def _hammer(name, options, user_id, upload_ids, start_at, duration, read_share, seed):
+    """One process's share of the test. Returns its counts and write latencies."""
+    _use_database(name, options)
+    rng = random.Random(seed)
+    user = User.objects.get(pk=user_id)
+    feed = feed_queryset({"branch": None, "semester": None, "subject": None, "type": None})
+    reasons = [key for key, _ in Report.REASON_CHOICES]
+    result = {"reads": 0, "writes": 0, "locked": 0, "errors": 0, "write_ms": []}
+
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < start_at + duration:
+        started = time.perf_counter()
+        try:
+            if rng.random() < read_share:
+                feed_page(feed)
+                result["reads"] += 1
+                continue
+            action = rng.randrange(3)
+            if action == 0:
+                add_points(user, "Stress test", 1)
+            elif action == 1:
+                rate_upload(user, rng.choice(upload_ids), rng.randint(1, 5))
+            else:
+                report_upload(user, rng.choice(upload_ids), rng.choice(reasons))
+            result["writes"] += 1
+            result["write_ms"].append((time.perf_counter() - started) * 1000)
+        except OperationalError as exc:
+            result["locked" if _is_locked(exc) else "errors"] += 1
+
+    connections.close_all()
+    return result
+
+
+def _seed(name, options, processes, uploads):
+    _use_database(name, options)
+    call_command("migrate", verbosity=0, interactive=False)
+    load_catalog(read_catalog_file())
+    # One more user than processes, since no one rates an upload twice
+    generate_load_data(users=processes + 1, uploads=uploads, ratings_per_upload=1, batch_size=1000, seed=0)
+
+
+def _summarize(results, duration):
+    write_ms = sorted(ms for r in results for ms in r["write_ms"])
+    reads = sum(r["reads"] for r in results)
+    writes = sum(r["writes"] for r in results)
+    locked = sum(r["locked"] for r in results)
+    attempts = reads + writes + locked + sum(r["errors"] for r in results)
+    return {
+        "reads_per_s": round(reads / duration, 1),
+        "writes_per_s": round(writes / duration, 1),
+        "locked_errors": locked,
+        "locked_rate": round(locked / attempts, 4) if attempts else 0.0,
+        "other_errors": sum(r["errors"] for r in results),
+        "p50_write_ms": round(statistics.median(write_ms), 2) if write_ms else None,
+        "p95_write_ms": round(write_ms[int(len(write_ms) * 0.95)], 2) if write_ms else None,
+        "max_write_ms": round(write_ms[-1], 2) if write_ms else None,
+    }
+
+
+def run_stress(processes=8, duration=10.0, read_share=0.5, uploads=2000, names=None, progress=None):
+    """
+    Run the test under each profile in `names` (all of them by default).
+
+    Returns {profile: summary}. The scratch database is deleted afterwards.
+    """
+    available = profiles()
+    names = names or list(available)
+    report = progress or (lambda name, summary: None)
+    default = connections["default"]
+    original = (default.settings_dict["NAME"], dict(default.settings_dict.get("OPTIONS", {})))
+    workdir = tempfile.mkdtemp(prefix="stress-")
+    name = os.path.join(workdir, "stress.sqlite3")
+    summaries = {}
+
+    try:
+        # The seeded blob is written under MEDIA_ROOT; keep it in the scratch directory too
+        with override_settings(MEDIA_ROOT=os.path.join(workdir, "media")):
+            _seed(name, available["tuned"], processes, uploads)
+        user_ids = list(User.objects.order_by("id").values_list("id", flat=True)[:processes])
+        upload_ids = list(Upload.objects.values_list("id", flat=True))
+
+        for profile in names:
+            options = available[profile]
+            # Journal mode sticks to the file, so switch it before the workers connect
+            _use_database(name, options)
+            default.ensure_connection()
+            # Forked workers must not share the parent's open database connection
+            connections.close_all()
+
+            start_at = time.time() + 1.0
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(_hammer, name, options, user_id, upload_ids, start_at, duration, read_share, n)
+                    for n, user_id in enumerate(user_ids)
+                ]
+                results = [future.result() for future in futures]
+            summaries[profile] = _summarize(results, duration)
+            report(profile, summaries[profile])
+    finally:
+        _use_database(*original)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return summaries
@@ -0,0 +1,41 @@
+"""
+Functions the job queue can run. Imported from CoreConfig.ready() so every
+worker process has them registered.
+"""
+from .blobs import delete_released_files
+from .extraction import extract_for_upload
+from .jobs import purge_finished_jobs, task
+from .previews import previews_for_upload
+from .ranking import update_scores
+from .uploads import purge_stale_chunked_uploads
+
+
+@task()
+def render_previews(upload_id):
+    previews_for_upload(upload_id)
+
+
+@task()
+def extract_text(upload_id):
+    extract_for_upload(upload_id)
+
+
+@task(max_attempts=10)
+def delete_files(names):
+    # Checked here, not when queued, since the same bytes may be stored again before this runs
+    delete_released_files(names)
+
+
+@task(max_attempts=1)
+def purge_chunked_uploads():
+    purge_stale_chunked_uploads()
+
+
+@task(max_attempts=1)
+def purge_jobs():
+    purge_finished_jobs()
+
+
+@task(max_attempts=1)
+def recompute_scores():
+    update_scores()
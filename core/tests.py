@@ -1,3 +1,675 @@
-from django.test import TestCase
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, clear_url_caches, resolve, reverse
+
+import config.urls
+
+from .api import issue_token
+from .blobs import release_blob, store_blob
+from .cache import SQLiteCache
+from .catalog import VERSION_KEY, catalog_version, get_catalog
+from .counters import flush_hits, pending_hits, record_hit
+from .exports import TABLES, export_chunks, import_rows, read_records
+from .feed import feed_cache_key, feed_generation
+from .jobs import get_task
+from .models import Blob, ChunkedUpload, Job, PointsLog, Rating, Report, Subject, Upload, UserPoints
+from .moderation import moderation_page, parse_moderation_cursor, set_status
+from .points import add_points, get_user_points, reconcile_balances
+from .previews import preview_names
+from .ranking import update_scores
+from .ratings import rate_upload, recount_upload_stats, report_upload
+from .uploads import UploadRejected, finish_chunked_upload, part_path, write_chunk
+from .benchmark import BENCHMARK_PDF, QUERY_BUDGETS, SKIPPED_ROUTES, measure, route_names, scratch_caches, seed_dataset
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix="core-tests-")
+
+# Two dataset sizes; a view's query count must be the same for both
+SMALL, LARGE = 40, 160
+
+
+# Hit counters are flushed by hand in these tests, never by the timer thread
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None, COUNTER_FLUSH_SECONDS=3600
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def measure_all(self, uploads):
+        data = seed_dataset(uploads)
+        return {name: measure(data, name) for name in route_names()}
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(sorted(QUERY_BUDGETS), route_names())
+        self.assertFalse(set(QUERY_BUDGETS) & set(SKIPPED_ROUTES))
+
+    def test_query_counts_stay_within_budget(self):
+        for name, result in self.measure_all(SMALL).items():
+            with self.subTest(route=name):
+                self.assertLess(result["status"], 500)
+                self.assertLessEqual(result["queries"], QUERY_BUDGETS[name])
+
+    def test_query_counts_do_not_grow_with_data(self):
+        with transaction.atomic():
+            small = self.measure_all(SMALL)
+            transaction.set_rollback(True)
+        large = self.measure_all(LARGE)
+
+        for name in small:
+            with self.subTest(route=name):
+                self.assertEqual(small[name]["queries"], large[name]["queries"])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class UploadsApiTests(TestCase):
+    def setUp(self):
+        self.data = seed_dataset(SMALL)
+
+    def test_list_pages_with_sparse_fields_and_etags(self):
+        client = self.data.member_client
+        url = reverse("api_v1_uploads")
+        response = client.get(url, {"fields": "id,title", "limit": 15})
+        page = response.json()
+        self.assertEqual(len(page["results"]), 15)
+        self.assertEqual(set(page["results"][0]), {"id", "title"})
+
+        rest = client.get(url, {"fields": "id,title", "limit": 15, "after": page["next"]}).json()
+        seen = [row["id"] for row in page["results"] + rest["results"]]
+        self.assertEqual(len(seen), len(set(seen)))
+        listed = Upload.objects.filter(listed=True).order_by("-created_at", "-id").values_list("id", flat=True)
+        self.assertEqual(seen, list(listed[:30]))
+
+        again = client.get(url, {"fields": "id,title", "limit": 15}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(client.get(url, {"fields": "id,nope"}).status_code, 400)
+
+    def test_new_rating_changes_the_list_etag(self):
+        client = self.data.member_client
+        url = reverse("api_v1_uploads")
+        response = client.get(url, {"fields": "id,rating_count"})
+        first = response.json()["results"][0]
+
+        rate_upload(User.objects.create_user("new-rater"), first["id"], 5)
+        again = client.get(url, {"fields": "id,rating_count"}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 200)
+        self.assertNotEqual(again["ETag"], response["ETag"])
+        self.assertEqual(again.json()["results"][0], {"id": first["id"], "rating_count": first["rating_count"] + 1})
+
+    def test_token_auth_and_visibility(self):
+        url = reverse("api_v1_upload", args=[self.data.note.id])
+        anon = Client()
+        self.assertEqual(anon.get(url).status_code, 401)
+
+        token = issue_token(self.data.member)
+        self.assertEqual(anon.get(url, HTTP_AUTHORIZATION=f"Bearer {token}").json()["id"], self.data.note.id)
+
+        hidden = Upload.objects.filter(status="HIDDEN").exclude(uploader=self.data.member).first()
+        self.assertEqual(self.data.member_client.get(reverse("api_v1_upload", args=[hidden.id])).status_code, 404)
+        self.assertEqual(self.data.staff_client.get(reverse("api_v1_upload", args=[hidden.id])).status_code, 200)
+
+        # A password change revokes tokens issued before it
+        self.data.member.set_password("changed")
+        self.data.member.save()
+        self.assertEqual(anon.get(url, HTTP_AUTHORIZATION=f"Bearer {token}").status_code, 401)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None, COUNTER_FLUSH_SECONDS=3600
+)
+class FileDeliveryTests(TestCase):
+    def setUp(self):
+        self.data = seed_dataset(SMALL)
+        # Views and downloads here are written inside this test's transaction, not left for the next test
+        self.addCleanup(flush_hits)
+
+    def test_unverified_file_is_not_served_to_others(self):
+        note = Upload.objects.filter(status="UNVERIFIED").exclude(uploader=self.data.member).first()
+        client = self.data.member_client
+        self.assertEqual(client.get(reverse("note_download", args=[note.id])).status_code, 403)
+
+        # No /media/ route, even with DEBUG on, where static() would have added one
+        path = settings.MEDIA_URL + note.file.name
+        try:
+            with override_settings(DEBUG=True):
+                importlib.reload(config.urls)
+                clear_url_caches()
+                with self.assertRaises(Resolver404):
+                    resolve(path)
+                self.assertEqual(client.get(path).status_code, 404)
+                self.assertEqual(Client().get(path).status_code, 404)
+        finally:
+            importlib.reload(config.urls)
+            clear_url_caches()
+
+    def test_taken_down_note_pages_are_only_shown_to_staff_and_the_uploader(self):
+        for status in ("HIDDEN", "REMOVED"):
+            with self.subTest(status=status):
+                note = Upload.objects.exclude(uploader=self.data.member).first()
+                Upload.objects.filter(pk=note.pk).update(status=status)
+                url = reverse("view_note", args=[note.id])
+                self.assertEqual(self.data.member_client.get(url).status_code, 404)
+                self.assertEqual(self.data.staff_client.get(url).status_code, 200)
+                uploader = Client()
+                uploader.force_login(note.uploader)
+                self.assertEqual(uploader.get(url).status_code, 200)
+
+    def test_byte_ranges_and_conditional_requests(self):
+        client = self.data.member_client
+        url = reverse("note_file", args=[self.data.note.id])
+        size = len(BENCHMARK_PDF)
+        etag = f'"{self.data.note.blob_id}"'
+
+        response = client.get(url, HTTP_RANGE="bytes=0-7")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 0-7/{size}")
+        self.assertEqual(b"".join(response.streaming_content), BENCHMARK_PDF[:8])
+
+        response = client.get(url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes {size - 5}-{size - 1}/{size}")
+        self.assertEqual(b"".join(response.streaming_content), BENCHMARK_PDF[-5:])
+
+        response = client.get(url, HTTP_RANGE=f"bytes={size}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{size}")
+
+        # A stale If-Range gets the whole file instead of a piece of the new one
+        response = client.get(url, HTTP_RANGE="bytes=0-7", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), BENCHMARK_PDF)
+        response = client.get(url, HTTP_RANGE="bytes=0-7", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_previews_are_public_and_immutable_but_originals_are_not(self):
+        note = Upload.objects.filter(status="UNVERIFIED").exclude(uploader=self.data.member).first()
+        thumbnail, preview = preview_names(note.blob_id)
+        for name in (thumbnail, preview):
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(b"RIFF\x1a\x00\x00\x00WEBPVP8L"))
+            response = Client().get(reverse("preview_image", args=[name]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "image/webp")
+            self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+
+        for name in (note.blob.file.name, note.file.name, f"blobs/{note.blob_id[:2]}/{note.blob_id}.pdf"):
+            with self.subTest(name=name):
+                self.assertEqual(Client().get(reverse("preview_image", args=[name])).status_code, 404)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    CACHES=scratch_caches(MEDIA_ROOT),
+    METRICS_SLOW_QUERY_MS=None,
+    CHUNKED_UPLOAD_DIR=os.path.join(MEDIA_ROOT, "chunked"),
+)
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.data = seed_dataset(SMALL)
+        self.chunked = self.data.chunked_upload()
+
+    def send(self, start, end):
+        self.chunked.refresh_from_db()
+        return write_chunk(self.chunked, io.BytesIO(BENCHMARK_PDF[start:end]), start, end)
+
+    def test_chunks_must_arrive_at_the_current_offset(self):
+        self.assertEqual(self.send(0, 100), 100)
+        with self.assertRaises(UploadRejected) as caught:
+            self.send(200, 300)
+        self.assertEqual(caught.exception.status, 409)
+        with self.assertRaises(UploadRejected) as caught:
+            finish_chunked_upload(self.chunked)
+        self.assertEqual(caught.exception.status, 409)
+
+        self.assertEqual(self.send(100, len(BENCHMARK_PDF)), len(BENCHMARK_PDF))
+        upload, sha256 = finish_chunked_upload(self.chunked)
+        self.assertEqual(sha256, hashlib.sha256(BENCHMARK_PDF).hexdigest())
+        self.assertEqual(upload.blob_id, sha256)
+        self.assertFalse(os.path.exists(part_path(self.chunked)))
+
+    def test_a_repeated_finish_creates_one_upload(self):
+        self.send(0, len(BENCHMARK_PDF))
+        self.chunked.refresh_from_db()
+        points = PointsLog.objects.filter(user=self.data.member).count()
+        uploads = Upload.objects.count()
+
+        finish_chunked_upload(self.chunked)
+        with self.assertRaises(UploadRejected) as caught:
+            finish_chunked_upload(self.chunked)
+        self.assertEqual(caught.exception.status, 409)
+        self.assertEqual(Upload.objects.count(), uploads + 1)
+        self.assertEqual(PointsLog.objects.filter(user=self.data.member).count(), points + 1)
+
+    def test_a_corrupted_upload_can_be_finished_again(self):
+        self.send(0, len(BENCHMARK_PDF))
+        self.chunked.refresh_from_db()
+        with self.assertRaises(UploadRejected):
+            finish_chunked_upload(self.chunked, "0" * 64)
+        self.assertTrue(ChunkedUpload.objects.filter(pk=self.chunked.pk).exists())
+        upload, sha256 = finish_chunked_upload(self.chunked, hashlib.sha256(BENCHMARK_PDF).hexdigest())
+        self.assertEqual(upload.blob_id, sha256)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class BlobTests(TestCase):
+    CONTENT = b"%PDF-1.4\n% blob tests\n%%EOF\n"
+
+    def run_queued_jobs(self):
+        for job in Job.objects.filter(status="QUEUED").order_by("id"):
+            get_task(job.name)(**job.payload)
+            job.delete()
+
+    def test_same_bytes_are_stored_once_and_counted(self):
+        first = store_blob(ContentFile(self.CONTENT), "a.pdf")
+        second = store_blob(ContentFile(self.CONTENT), "b.pdf")
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(Blob.objects.get(pk=first.pk).ref_count, 2)
+
+        self.assertFalse(release_blob(first.pk))
+        self.assertEqual(Blob.objects.get(pk=first.pk).ref_count, 1)
+        self.run_queued_jobs()
+        self.assertTrue(default_storage.exists(first.file.name))
+
+        self.assertTrue(release_blob(first.pk))
+        self.assertFalse(Blob.objects.filter(pk=first.pk).exists())
+        self.run_queued_jobs()
+        self.assertFalse(default_storage.exists(first.file.name))
+
+    def test_bytes_stored_again_before_the_delete_job_runs_are_kept(self):
+        blob = store_blob(ContentFile(self.CONTENT), "a.pdf")
+        self.assertTrue(release_blob(blob.pk))
+        again = store_blob(ContentFile(self.CONTENT), "a.pdf")
+        self.assertEqual(again.file.name, blob.file.name)
+
+        self.run_queued_jobs()
+        self.assertTrue(default_storage.exists(again.file.name))
+        with default_storage.open(again.file.name) as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class CatalogTests(TestCase):
+    def test_version_moves_after_commit_and_survives_eviction(self):
+        data = seed_dataset(SMALL)
+        before = get_catalog()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Subject.objects.create(branch=data.subject.branch, semester=data.subject.semester, name="Added")
+        self.assertEqual(catalog_version(), before.version)
+        for callback in callbacks:
+            callback()
+        after = get_catalog()
+        self.assertNotEqual(after.version, before.version)
+        self.assertIn("Added", [s["name"] for s in after.subjects])
+
+        # A version the cache dropped comes back newer, never at an old value
+        cache.delete(VERSION_KEY)
+        self.assertGreater(catalog_version(), after.version)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class HomeGridCacheTests(TestCase):
+    TITLE = "Grid cache probe"
+
+    def setUp(self):
+        self.data = seed_dataset(SMALL)
+
+    def listed_on_home(self, **filters):
+        response = self.data.member_client.get(reverse("home"), {key: value.pk for key, value in filters.items()})
+        self.assertEqual(response.status_code, 200)
+        return self.TITLE in response.content.decode()
+
+    def test_cached_grid_follows_upload_changes(self):
+        subject = self.data.subject
+        other = Subject.objects.exclude(branch=subject.branch).order_by("pk").first()
+        views = [{"subject": subject}, {"branch": subject.branch}, {"semester": subject.semester}, {}]
+        # Fill the cache for every grid the upload will show up on
+        for filters in views:
+            self.assertFalse(self.listed_on_home(**filters))
+
+        file = SimpleUploadedFile("probe.pdf", BENCHMARK_PDF, content_type="application/pdf")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data.member_client.post(
+                reverse("upload_note"),
+                {
+                    "branch": subject.branch_id, "semester": subject.semester_id, "subject": subject.pk,
+                    "title": self.TITLE, "upload_type": "NOTES", "file": file,
+                },
+            )
+        upload = Upload.objects.get(title=self.TITLE)
+        for filters in views:
+            with self.subTest("created", **filters):
+                self.assertTrue(self.listed_on_home(**filters))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data.staff_client.post(reverse("remove_upload", args=[upload.pk]))
+        for filters in views:
+            with self.subTest("removed", **filters):
+                self.assertFalse(self.listed_on_home(**filters))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data.staff_client.post(reverse("verify_upload", args=[upload.pk]))
+        for filters in views:
+            with self.subTest("verified", **filters):
+                self.assertTrue(self.listed_on_home(**filters))
+
+        upload.subject = other
+        with self.captureOnCommitCallbacks(execute=True):
+            upload.save()
+        self.assertFalse(self.listed_on_home(subject=subject))
+        self.assertFalse(self.listed_on_home(branch=subject.branch))
+        self.assertTrue(self.listed_on_home(subject=other))
+        self.assertTrue(self.listed_on_home(branch=other.branch))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data.member_client.post(reverse("delete_upload", args=[upload.pk]))
+        self.assertFalse(Upload.objects.filter(pk=upload.pk).exists())
+        for filters in [{"subject": other}, {"branch": other.branch}, {}]:
+            with self.subTest("deleted", **filters):
+                self.assertFalse(self.listed_on_home(**filters))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class PointsTests(TestCase):
+    def ledger(self):
+        totals = PointsLog.objects.values("user_id").annotate(total=Sum("points_change")).order_by()
+        return {row["user_id"]: row["total"] for row in totals}
+
+    def test_balances_move_with_the_ledger_and_reconcile_in_batches(self):
+        data = seed_dataset(SMALL)
+        newcomer = User.objects.create_user("newcomer")
+        add_points(newcomer, "Uploaded note", 10)
+        add_points(newcomer, "Deleted upload", -10)
+        add_points(data.member, "Uploaded note", 10)
+        self.assertEqual(get_user_points(newcomer), 0)
+
+        # Drift every balance, lose one and add one with no ledger behind it
+        UserPoints.objects.update(points=F("points") + 3)
+        UserPoints.objects.filter(user=data.member).delete()
+        UserPoints.objects.create(user=User.objects.create_user("no-ledger"), points=5)
+
+        ledger = self.ledger()
+        self.assertEqual(reconcile_balances(batch_size=2), len(ledger))
+        self.assertEqual(dict(UserPoints.objects.values_list("user_id", "points")), ledger)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class ExportImportTests(TestCase):
+    def test_dump_loads_back_unchanged(self):
+        seed_dataset(SMALL)
+        for name, fmt in [("uploads", "csv"), ("ratings", "ndjson"), ("points_log", "csv")]:
+            with self.subTest(table=name):
+                model, columns = TABLES[name]
+                before = list(model.objects.order_by("pk").values_list(*columns))
+                dump = "".join(export_chunks(name, fmt, chunk_size=7))
+                # Every row is already there
+                self.assertEqual(import_rows(name, read_records(io.StringIO(dump, newline=""), fmt)), (0, len(before)))
+                if model is Upload:
+                    continue
+
+                model.objects.all().delete()
+                inserted, skipped = import_rows(name, read_records(io.StringIO(dump, newline=""), fmt), batch_size=9)
+                self.assertEqual((inserted, skipped), (len(before), 0))
+                self.assertEqual(list(model.objects.order_by("pk").values_list(*columns)), before)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None, COUNTER_FLUSH_SECONDS=3600
+)
+class HitCounterTests(TestCase):
+    def test_hits_are_deduplicated_and_flushed_in_one_update(self):
+        data = seed_dataset(SMALL)
+        flush_hits()
+        other = Upload.objects.filter(listed=True).exclude(pk=data.note.pk).first()
+        for _ in range(3):
+            data.member_client.get(reverse("view_note", args=[data.note.id]))
+        data.staff_client.get(reverse("view_note", args=[data.note.id]))
+        data.member_client.get(reverse("view_note", args=[other.id]))
+        data.member_client.get(reverse("note_download", args=[data.note.id]))
+        self.assertEqual(
+            pending_hits(), {("view", data.note.pk): 2, ("view", other.pk): 1, ("download", data.note.pk): 1}
+        )
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(flush_hits(), 2)
+        self.assertEqual(len(captured), 1)
+        self.assertEqual(pending_hits(), {})
+        counts = dict(Upload.objects.filter(pk__in=[data.note.pk, other.pk]).values_list("pk", "view_count"))
+        self.assertEqual(counts, {data.note.pk: 2, other.pk: 1})
+        self.assertEqual(Upload.objects.get(pk=data.note.pk).download_count, 1)
+
+    def test_dedupe_marks_are_bounded_and_kept_out_of_the_cache(self):
+        data = seed_dataset(SMALL)
+        flush_hits()
+        self.addCleanup(flush_hits)
+        with override_settings(COUNTER_DEDUPE_MAX_ENTRIES=2):
+            self.assertTrue(record_hit("view", data.note.pk, 1))
+            self.assertFalse(record_hit("view", data.note.pk, 1))
+            self.assertTrue(record_hit("view", data.note.pk, 2))
+            self.assertTrue(record_hit("view", data.note.pk, 3))
+            # The oldest mark made room for the newest
+            self.assertTrue(record_hit("view", data.note.pk, 1))
+        self.assertIsNone(cache.get(f"hit:view:{data.note.pk}:1"))
+        self.assertEqual(pending_hits(), {("view", data.note.pk): 4})
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class ModerationTests(TestCase):
+    def setUp(self):
+        self.data = seed_dataset(SMALL)
+
+    def test_queue_pages_most_reported_then_oldest(self):
+        queue = Upload.objects.filter(status="UNVERIFIED").order_by("-report_count", "created_at", "id")
+        seen, cursor = [], None
+        while True:
+            items, cursor = moderation_page(parse_moderation_cursor(cursor), limit=3)
+            seen += [item.pk for item in items]
+            if cursor is None:
+                break
+        self.assertEqual(seen, list(queue.values_list("pk", flat=True)))
+
+    def test_set_status_moves_only_what_changed(self):
+        pending = list(Upload.objects.filter(status="UNVERIFIED").order_by("id")[:2])
+        verified = Upload.objects.filter(status="VERIFIED").exclude(subject__in=[u.subject_id for u in pending]).first()
+        filters = {"branch": "", "semester": "", "type": "", "sort": ""}
+        moved, kept = ({**filters, "subject": str(upload.subject_id)} for upload in (pending[0], verified))
+        before = feed_generation(moved), feed_generation(kept)
+
+        ids = [str(upload.pk) for upload in pending] + [verified.pk, "junk", ""]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(set_status(ids, "VERIFIED"), (3, 2))
+        self.assertEqual(Upload.objects.filter(pk__in=[u.pk for u in pending], status="VERIFIED").count(), 2)
+        # Only feeds an upload actually moved in are retired
+        self.assertNotEqual(feed_generation(moved), before[0])
+        self.assertEqual(feed_generation(kept), before[1])
+
+        self.assertEqual(set_status(["junk"], "REMOVED"), (0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(set_status([verified.pk], "REMOVED"), (1, 1))
+        self.assertFalse(Upload.objects.get(pk=verified.pk).listed)
+        self.assertNotEqual(feed_generation(kept), before[1])
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None, REPORT_AUTO_HIDE_THRESHOLD=2
+)
+class ReportTests(TestCase):
+    def setUp(self):
+        self.data = seed_dataset(SMALL)
+        self.note = self.data.note
+        Report.objects.filter(upload=self.note).delete()
+        Upload.objects.filter(pk=self.note.pk).update(report_count=0, reviewed_report_count=0)
+        self.reporters = [User.objects.create_user(f"reporter-{i}") for i in range(5)]
+
+    def status(self):
+        return Upload.objects.get(pk=self.note.pk).status
+
+    def test_verifying_a_hidden_upload_resets_the_auto_hide_count(self):
+        note, reporters = self.note, self.reporters
+        self.assertFalse(report_upload(reporters[0], note.pk, "SPAM"))
+        self.assertTrue(report_upload(reporters[1], note.pk, "SPAM"))
+        self.assertEqual(self.status(), "HIDDEN")
+
+        self.assertEqual(set_status([note.pk], "VERIFIED"), (1, 1))
+        # One more report after the review is not enough on its own
+        self.assertFalse(report_upload(reporters[2], note.pk, "SPAM"))
+        self.assertEqual(self.status(), "VERIFIED")
+        self.assertTrue(report_upload(reporters[3], note.pk, "WRONG"))
+        self.assertEqual(self.status(), "HIDDEN")
+
+    def test_keeping_an_already_verified_upload_counts_as_a_review(self):
+        note, reporters = self.note, self.reporters
+        self.assertEqual(self.status(), "VERIFIED")
+        self.assertFalse(report_upload(reporters[0], note.pk, "SPAM"))
+
+        response = self.data.staff_client.post(reverse("moderate_uploads"), {"action": "verify", "ids": [note.pk]})
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ["1 upload(s) reviewed, 0 newly marked verified."],
+        )
+        self.assertEqual(Upload.objects.get(pk=note.pk).reviewed_report_count, 1)
+
+        self.assertFalse(report_upload(reporters[1], note.pk, "SPAM"))
+        self.assertEqual(self.status(), "VERIFIED")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class RatingTests(TestCase):
+    def totals(self, upload):
+        return tuple(Upload.objects.filter(pk=upload.pk).values_list("rating_sum", "rating_count", "report_count")[0])
+
+    def test_totals_move_by_the_delta(self):
+        data = seed_dataset(SMALL)
+        note = data.note
+        Rating.objects.filter(upload=note).delete()
+        Report.objects.filter(upload=note).delete()
+        Upload.objects.filter(pk=note.pk).update(rating_sum=0, rating_count=0, report_count=0)
+        first, second = User.objects.create_user("rater-1"), User.objects.create_user("rater-2")
+
+        rate_upload(first, note.pk, 4)
+        self.assertEqual(self.totals(note), (4, 1, 0))
+        # A re-rating shifts the sum and leaves the count alone
+        rate_upload(first, note.pk, 2)
+        self.assertEqual(self.totals(note), (2, 1, 0))
+        rate_upload(second, note.pk, 5)
+        self.assertEqual(self.totals(note), (7, 2, 0))
+        self.assertEqual(Rating.objects.get(user=first, upload=note).stars, 2)
+
+        report_upload(first, note.pk, "SPAM")
+        # A repeat report keeps the first reason and counts once
+        self.assertFalse(report_upload(first, note.pk, "WRONG"))
+        self.assertEqual(self.totals(note), (7, 2, 1))
+        self.assertEqual(Report.objects.get(reporter=first, upload=note).reason, "SPAM")
+
+        # The running totals agree with a full recount
+        Upload.objects.filter(pk=note.pk).update(rating_sum=0, rating_count=0, report_count=0)
+        recount_upload_stats()
+        self.assertEqual(self.totals(note), (7, 2, 1))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=scratch_caches(MEDIA_ROOT), METRICS_SLOW_QUERY_MS=None)
+class RankingTests(TestCase):
+    def test_score_sorts_page_in_score_order(self):
+        data = seed_dataset(SMALL)
+        listed = Upload.objects.filter(listed=True)
+        self.assertEqual(update_scores(), listed.count())
+        loved = listed.order_by("id").first()
+        Upload.objects.filter(pk=loved.pk).update(rating_sum=F("rating_sum") + 500, rating_count=F("rating_count") + 100)
+        update_scores()
+
+        url = reverse("api_v1_uploads")
+        for sort, column in [("top", "top_score"), ("trending", "trending_score")]:
+            with self.subTest(sort=sort):
+                first = data.member_client.get(url, {"sort": sort, "fields": "id", "limit": 10}).json()
+                rest = data.member_client.get(
+                    url, {"sort": sort, "fields": "id", "limit": 10, "after": first["next"]}
+                ).json()
+                ids = [row["id"] for row in first["results"] + rest["results"]]
+                expected = listed.order_by(f"-{column}", "-id").values_list("id", flat=True)[:20]
+                self.assertEqual(ids, list(expected))
+                self.assertEqual(ids[0], loved.pk)
+
+    def test_score_pages_are_not_reused_after_the_version_is_evicted(self):
+        filters = {"branch": "", "semester": "", "subject": "", "type": "", "sort": "top"}
+        cache.set("feed:scores", 0, None)
+        before = feed_cache_key("home:grid", filters)
+        cache.delete("feed:scores")
+        after = feed_cache_key("home:grid", filters)
+        self.assertNotEqual(after, before)
+        self.assertEqual(feed_cache_key("home:grid", filters), after)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="core-cache-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        # A separate location per test, so front tiers aren't shared between tests
+        return SQLiteCache(os.path.join(self.directory, "cache.sqlite3"), {"OPTIONS": options})
+
+    def test_values_are_shared_and_expire(self):
+        other = self.make_cache()
+        self.cache.set("a", {"x": 1}, 1)
+        self.assertEqual(other.get("a"), {"x": 1})
+        self.assertFalse(self.cache.add("a", 2))
+        self.assertTrue(self.cache.add("n", 5))
+        self.assertEqual(other.incr("n", 2), 7)
+        self.cache.set("v", "old", version=2)
+        self.assertIsNone(self.cache.get("v"))
+        self.assertEqual(self.cache.get("v", version=2), "old")
+        time.sleep(1.05)
+        self.assertIsNone(other.get("a"))
+        self.assertTrue(self.cache.add("a", 3))
+
+    def test_least_recently_used_entries_are_culled(self):
+        small = self.make_cache(MAX_ENTRIES=50)
+        for i in range(300):
+            small.set(f"k{i}", i)
+        count = small._db().execute("SELECT count(*) FROM cache_entry").fetchone()[0]
+        self.assertLessEqual(count, 50)
+        self.assertEqual(small.get("k299"), 299)
+
+    def test_missing_value_is_computed_once(self):
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        def worker():
+            results.append(self.make_cache().get_or_set("slow", compute, 30))
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 6)
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,249 @@
+"""
+Creating uploads, in one request or as a resumable chunked transfer.
+
+A chunked upload is started with its metadata and declared size, then its
+bytes arrive as PUTs at increasing offsets and are appended to a part file
+under CHUNKED_UPLOAD_DIR. Only the acknowledged offset is stored in the
+database, so a client that drops off asks for it and carries on from there.
+Size and type limits are checked at init and on the first chunk, before the
+rest of the file is sent.
+"""
+import hashlib
+import os
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .blobs import store_blob
+from .models import ChunkedUpload, Subject, Upload
+from .pipeline import schedule_post_upload
+from .points import add_points
+
+READ_SIZE = 64 * 1024
+
+_CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadRejected(Exception):
+    """The upload breaks a limit; the message is safe to show to the user."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def create_upload(user, subject, title, description, file, upload_type, sha256=None):
+    """Store a finished upload and award points, the same way for every upload path."""
+    with transaction.atomic():
+        blob = store_blob(file, file.name, sha256=sha256, size=file.size)
+        upload = Upload.objects.create(
+            uploader=user,
+            subject=subject,
+            title=title,
+            description=description,
+            file=blob.file.name,
+            blob=blob,
+            upload_type=upload_type,
+            status="UNVERIFIED",
+        )
+
+        add_points(user, "Uploaded note", 10)
+        schedule_post_upload(upload.id)
+    return upload
+
+
+def check_file_type(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in settings.UPLOAD_ALLOWED_TYPES:
+        allowed = ", ".join(sorted(settings.UPLOAD_ALLOWED_TYPES))
+        raise UploadRejected(f"Only {allowed} files can be uploaded.", status=415)
+    return ext
+
+
+def check_file_header(filename, head):
+    magic = settings.UPLOAD_ALLOWED_TYPES[check_file_type(filename)]
+    if not head.startswith(magic):
+        raise UploadRejected("The file's contents do not match its type.", status=415)
+
+
+def check_file_size(size):
+    if size <= 0:
+        raise UploadRejected("The file is empty.")
+    if size > settings.UPLOAD_MAX_SIZE:
+        limit = settings.UPLOAD_MAX_SIZE // (1024 * 1024)
+        raise UploadRejected(f"Files can be at most {limit} MB.", status=413)
+
+
+# -------------------------
+# Chunked uploads
+# -------------------------
+# Running hashes of uploads whose chunks have all arrived at this process, by id
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def part_path(chunked):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{chunked.pk}.part")
+
+
+def start_chunked_upload(user, subject_id, title, description, upload_type, filename, size):
+    if not (subject_id and title and upload_type and filename):
+        raise UploadRejected("Please fill all required fields.")
+    if upload_type not in dict(Upload.TYPE_CHOICES):
+        raise UploadRejected("Invalid upload type.")
+
+    check_file_type(filename)
+    check_file_size(size)
+
+    subject = Subject.objects.filter(pk=subject_id).first() if str(subject_id).isdigit() else None
+    if subject is None:
+        raise UploadRejected("Unknown subject.")
+
+    chunked = ChunkedUpload.objects.create(
+        user=user,
+        subject=subject,
+        title=title,
+        description=description,
+        upload_type=upload_type,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+    )
+
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(chunked), "wb").close()
+    with _hashers_lock:
+        _hashers[chunked.pk] = (hashlib.sha256(), 0)
+    return chunked
+
+
+def parse_content_range(header, size):
+    """Return (start, end_exclusive) from a 'bytes a-b/total' header."""
+    match = _CONTENT_RANGE.match(header or "")
+    if not match:
+        raise UploadRejected("Content-Range header is required.")
+
+    start, last, total = (int(g) for g in match.groups())
+    if total != size or last < start or last >= size:
+        raise UploadRejected("Content-Range does not match the upload.", status=416)
+    if last - start + 1 > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        raise UploadRejected("Chunk is too large.", status=413)
+    return start, last + 1
+
+
+def write_chunk(chunked, stream, start, end):
+    """
+    Append bytes [start, end) read from `stream` to the part file.
+
+    Returns the new acknowledged offset. A chunk that doesn't start at the
+    current offset is rejected with 409 so the client can resume correctly.
+    """
+    if start != chunked.offset:
+        raise UploadRejected("Chunk does not start at the current offset.", status=409)
+
+    with _hashers_lock:
+        hasher, hashed = _hashers.pop(chunked.pk, (None, None))
+    if hashed != start:
+        hasher = None
+
+    expected = end - start
+    received = 0
+    with open(part_path(chunked), "r+b") as fh:
+        fh.seek(start)
+        fh.truncate()
+        while received < expected:
+            data = stream.read(min(READ_SIZE, expected - received))
+            if not data:
+                break
+            if start == 0 and received == 0:
+                check_file_header(chunked.filename, data)
+            fh.write(data)
+            if hasher:
+                hasher.update(data)
+            received += len(data)
+
+    if received != expected:
+        raise UploadRejected("Chunk ended early.", status=400)
+
+    # Only one writer can move the offset from `start`
+    if not ChunkedUpload.objects.filter(pk=chunked.pk, offset=start).update(offset=end, updated_at=timezone.now()):
+        raise UploadRejected("Chunk was already received.", status=409)
+
+    if hasher:
+        with _hashers_lock:
+            _hashers[chunked.pk] = (hasher, end)
+    return end
+
+
+def _sha256_of(chunked):
+    with _hashers_lock:
+        hasher, hashed = _hashers.pop(chunked.pk, (None, None))
+    if hasher and hashed == chunked.size:
+        return hasher.hexdigest()
+
+    # Chunks went to several processes: hash the part file instead
+    hasher = hashlib.sha256()
+    with open(part_path(chunked), "rb") as fh:
+        for data in iter(lambda: fh.read(READ_SIZE), b""):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _remove_part(chunked):
+    try:
+        os.remove(part_path(chunked))
+    except FileNotFoundError:
+        pass
+
+
+def finish_chunked_upload(chunked, expected_sha256=""):
+    """
+    Turn a fully received chunked upload into an Upload. Returns (upload, sha256).
+
+    The ChunkedUpload row is claimed by deleting it in the same transaction
+    that creates the Upload, so a retried or repeated finish gets a 409
+    rather than a second Upload.
+    """
+    with transaction.atomic():
+        if not ChunkedUpload.objects.filter(pk=chunked.pk, offset=chunked.size).delete()[0]:
+            if ChunkedUpload.objects.filter(pk=chunked.pk).exists():
+                raise UploadRejected("The upload is not complete yet.", status=409)
+            raise UploadRejected("The upload was already finished.", status=409)
+
+        sha256 = _sha256_of(chunked)
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise UploadRejected("The file was corrupted in transfer; please upload it again.")
+
+        with open(part_path(chunked), "rb") as fh:
+            upload = create_upload(
+                chunked.user,
+                chunked.subject,
+                chunked.title,
+                chunked.description,
+                File(fh, name=chunked.filename),
+                chunked.upload_type,
+                sha256=sha256,
+            )
+    _remove_part(chunked)
+    return upload, sha256
+
+
+def discard_chunked_upload(chunked):
+    with _hashers_lock:
+        _hashers.pop(chunked.pk, None)
+    _remove_part(chunked)
+    chunked.delete()
+
+
+def purge_stale_chunked_uploads(hours=None):
+    """Drop chunked uploads that haven't received data for `hours`. Returns how many."""
+    hours = settings.CHUNKED_UPLOAD_EXPIRY_HOURS if hours is None else hours
+    cutoff = timezone.now() - timedelta(hours=hours)
+    stale = list(ChunkedUpload.objects.filter(updated_at__lt=cutoff))
+    for chunked in stale:
+        discard_chunked_upload(chunked)
+    return len(stale)
@@ -13,6 +13,17 @@ urlpatterns = [
     path("upload/", views.upload_note, name="upload_note"),
     path("view/<int:pk>/", views.view_note, name="view_note"),
 
+    # file delivery
+    path("view/<int:pk>/file/", views.note_file, name="note_file"),
+    path("view/<int:pk>/download/", views.note_download, name="note_download"),
+    path("files/<str:token>/", views.signed_file, name="signed_file"),
+    path("previews/<path:name>", views.preview_image, name="preview_image"),
+
+    # resumable chunked uploads
+    path("api/uploads/", views.api_chunked_start, name="api_chunked_start"),
+    path("api/uploads/<uuid:upload_id>/", views.api_chunked_upload, name="api_chunked_upload"),
+    path("api/uploads/<uuid:upload_id>/finish/", views.api_chunked_finish, name="api_chunked_finish"),
+
     # rating + report
     path("rate/<int:pk>/", views.rate_note, name="rate_note"),
     path("report/<int:pk>/", views.report_note, name="report_note"),
@@ -27,12 +38,25 @@ urlpatterns = [
     # api for dynamic subjects dropdown
     path("api/subjects/", views.api_subjects, name="api_subjects"),
     path("ajax/get-subjects/", views.api_subjects, name="get_subjects"),
+    path("api/catalog/", views.api_catalog, name="api_catalog"),
+
+    # full-text search
+    path("api/search/", views.api_search, name="api_search"),
+
+    # versioned read API
+    path("api/v1/uploads/", views.api_v1_uploads, name="api_v1_uploads"),
+    path("api/v1/uploads/<int:pk>/", views.api_v1_upload, name="api_v1_upload"),
+    path("api/v1/token/", views.api_v1_token, name="api_v1_token"),
 
     # admin panel
     path("admin-panel/uploads/", views.admin_uploads, name="admin_uploads"),
+    path("admin-panel/queue/", views.moderation_queue, name="moderation_queue"),
+    path("admin-panel/uploads/moderate/", views.moderate_uploads, name="moderate_uploads"),
     path("admin-panel/uploads/<int:pk>/verify/", views.verify_upload, name="verify_upload"),
     path("admin-panel/uploads/<int:pk>/remove/", views.remove_upload, name="remove_upload"),
     path("admin-panel/reports/", views.admin_reports, name="admin_reports"),
+    path("admin-panel/export/<str:table>/", views.export_data, name="export_data"),
+    path("metrics/", views.metrics, name="metrics"),
 
     # footer pages
     path("privacy-policy/", views.privacy_policy, name="privacy_policy"),
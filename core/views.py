@@ -1,26 +1,78 @@
+import json
+import os
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.db.models import Avg, Sum
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.http import require_POST
-from django.views.decorators.cache import never_cache
-
-from .models import Branch, Semester, Subject, Upload, Rating, Report, PointsLog
-
-
-# -------------------------
-# Points helper
-# -------------------------
-def add_points(user, action, points):
-    PointsLog.objects.create(user=user, action=action, points_change=points)
-
-
-def get_user_points(user):
-    total = PointsLog.objects.filter(user=user).aggregate(total=Sum("points_change"))["total"]
-    return total or 0
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_http_methods, require_POST
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import ChunkedUpload, Subject, Upload, Rating, Report
+from .api import (
+    DETAIL_FIELDS,
+    LIST_FIELDS,
+    api_auth,
+    body_etag,
+    cached_fields,
+    error_response,
+    issue_token,
+    json_response,
+    parse_fields,
+    parse_limit,
+    upload_detail,
+    upload_rows_page,
+    with_live_fields,
+)
+from .catalog import get_catalog
+from .counters import record_hit
+from .delivery import file_response, load_signed_file, upload_file_response
+from .exports import FORMATS as EXPORT_FORMATS, TABLES as EXPORT_TABLES, export_chunks
+from .feed import (
+    FEED_CACHE_TIMEOUT,
+    feed_cache_key,
+    feed_filters,
+    feed_page,
+    feed_queryset,
+    first_feed_page,
+    parse_feed_cursor,
+)
+from .metrics import metrics_text
+from .moderation import (
+    MODERATION_ACTIONS,
+    TRIAGE_PAGE_SIZE,
+    moderation_page,
+    parse_moderation_cursor,
+    reason_field,
+    report_triage,
+    set_status,
+)
+from .pagination import decode_cursor, encode_cursor
+from .previews import PREVIEW_NAME
+from .points import add_points, leaderboard_first_page, leaderboard_page, rank_neighbours
+from .ratings import avg_rating_expression, rate_upload, report_upload
+from .search import search_page
+from .uploads import (
+    UploadRejected,
+    check_file_header,
+    check_file_size,
+    create_upload,
+    discard_chunked_upload,
+    finish_chunked_upload,
+    parse_content_range,
+    start_chunked_upload,
+    write_chunk,
+)
 
 
 # -------------------------
@@ -86,67 +138,210 @@ def logout_view(request):
 # -------------------------
 @login_required
 def home(request):
-    branches = Branch.objects.all().order_by("name")
-    semesters = Semester.objects.all().order_by("number")
-
-    selected_branch = request.GET.get("branch", "")
-    selected_semester = request.GET.get("semester", "")
-    selected_subject = request.GET.get("subject", "")
-    selected_type = request.GET.get("type", "")
-
-    notes = (
-        Upload.objects.select_related("subject", "subject__branch", "subject__semester")
-        .filter(status__in=["VERIFIED", "UNVERIFIED"])
-        .order_by("-created_at")
-    )
+    catalog = get_catalog()
+
+    filters = feed_filters(request.GET)
+    query = request.GET.get("q", "").strip()
+
+    if query:
+        page = _page_number(request)
+        notes, has_next = search_page(
+            query,
+            filters,
+            page=page,
+            queryset=Upload.objects.select_related("subject", "branch", "semester", "blob"),
+        )
+        next_query = first_query = ""
+        if has_next:
+            params = request.GET.copy()
+            params["page"] = page + 1
+            next_query = params.urlencode()
+        if page > 1:
+            params = request.GET.copy()
+            params.pop("page", None)
+            first_query = params.urlencode()
+        grid = _render_home_grid(notes, next_query, first_query, page == 1)
+    else:
+        token = request.GET.get("after", "")
+        cursor = parse_feed_cursor(token, filters["sort"])
+        # The grid is the same for everyone, so it is cached per filter tuple and page
+        grid = cache.get_or_set(
+            feed_cache_key("home:grid", filters, token if cursor else ""),
+            lambda: _build_home_grid(filters, cursor),
+            FEED_CACHE_TIMEOUT,
+        )
 
-    if selected_branch:
-        notes = notes.filter(subject__branch_id=selected_branch)
+    return render(
+        request,
+        "core/home.html",
+        {
+            "branches": catalog.branches,
+            "semesters": catalog.semesters,
+            "catalog_version": catalog.etag,
+            "grid": grid,
+            "selected_branch": filters["branch"],
+            "selected_semester": filters["semester"],
+            "selected_subject": filters["subject"],
+            "selected_type": filters["type"],
+            "selected_sort": filters["sort"],
+            "query": query,
+        },
+    )
 
-    if selected_semester:
-        notes = notes.filter(subject__semester_id=selected_semester)
 
-    if selected_subject:
-        notes = notes.filter(subject_id=selected_subject)
+def _build_home_grid(filters, cursor):
+    if cursor is None:
+        notes, next_cursor = first_feed_page(filters)
+    else:
+        notes, next_cursor = feed_page(
+            feed_queryset(filters).select_related("subject", "branch", "semester", "blob"),
+            cursor,
+            sort=filters["sort"],
+        )
+    # Links are built from the cleaned filters, not the raw query string, since the grid is shared
+    params = {key: value for key, value in filters.items() if value}
+    next_query = urlencode({**params, "after": next_cursor}) if next_cursor else ""
+    return _render_home_grid(notes, next_query, urlencode(params), cursor is None)
 
-    if selected_type:
-        notes = notes.filter(upload_type=selected_type)
 
-    return render(
-        request,
-        "core/home.html",
+def _render_home_grid(notes, next_query, first_query, is_first_page):
+    return render_to_string(
+        "core/home_grid.html",
         {
-            "branches": branches,
-            "semesters": semesters,
             "notes": notes,
-            "selected_branch": selected_branch,
-            "selected_semester": selected_semester,
-            "selected_subject": selected_subject,
-            "selected_type": selected_type,
-            "user_points": get_user_points(request.user),
+            "next_query": next_query,
+            "first_query": first_query,
+            "is_first_page": is_first_page,
         },
     )
 
 
+def _page_number(request):
+    page = request.GET.get("page", "")
+    return int(page) if page.isdigit() and int(page) > 0 else 1
+
+
 # -------------------------
 # API: subjects dropdown
 # -------------------------
+def _catalog_etag(request, *args, **kwargs):
+    return get_catalog().etag
+
+
 @login_required
+@cache_control(private=True, max_age=60)
+@condition(etag_func=_catalog_etag)
 def api_subjects(request):
-    branch_id = request.GET.get("branch_id")
-    semester_id = request.GET.get("semester_id")
+    branch_id = request.GET.get("branch_id", "")
+    semester_id = request.GET.get("semester_id", "")
 
-    qs = Subject.objects.all()
+    data = get_catalog().subjects_for(
+        int(branch_id) if branch_id.isdigit() else None,
+        int(semester_id) if semester_id.isdigit() else None,
+    )
+    return JsonResponse(data, safe=False)
 
-    if branch_id:
-        qs = qs.filter(branch_id=branch_id)
 
-    if semester_id:
-        qs = qs.filter(semester_id=semester_id)
+@login_required
+@condition(etag_func=_catalog_etag)
+def api_catalog(request):
+    catalog = get_catalog()
 
-    qs = qs.order_by("name")
-    data = [{"id": s.id, "name": s.name} for s in qs]
-    return JsonResponse(data, safe=False)
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = HttpResponse(catalog.bundle_gzip, content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(catalog.bundle, content_type="application/json")
+    patch_vary_headers(response, ["Accept-Encoding"])
+
+    # URLs carrying the current version never change; anything else revalidates
+    if request.GET.get("v") == catalog.etag:
+        patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
+# -------------------------
+# API: search
+# -------------------------
+@login_required
+def api_search(request):
+    query = request.GET.get("q", "").strip()
+    page = _page_number(request)
+
+    notes, has_next = search_page(
+        query,
+        feed_filters(request.GET),
+        page=page,
+        queryset=Upload.objects.select_related("subject"),
+    )
+    data = {
+        "results": [
+            {
+                "id": n.id,
+                "title": n.title,
+                "subject": n.subject.name,
+                "type": n.upload_type,
+                "status": n.status,
+                "url": reverse("view_note", args=[n.id]),
+            }
+            for n in notes
+        ],
+        "next_page": page + 1 if has_next else None,
+    }
+    return JsonResponse(data)
+
+
+# -------------------------
+# API v1: uploads
+# -------------------------
+@require_http_methods(["GET", "HEAD"])
+@api_auth
+def api_v1_uploads(request):
+    filters = feed_filters(request.GET)
+    try:
+        fields = parse_fields(request.GET.get("fields", ""), LIST_FIELDS)
+    except ValueError as exc:
+        return error_response(400, str(exc))
+    limit = parse_limit(request.GET.get("limit", ""))
+    token = request.GET.get("after", "")
+    cursor = parse_feed_cursor(token, filters["sort"])
+
+    stable = cached_fields(fields)
+
+    # Lists are the same for everyone, so they are cached like the home grid, less the live counters
+    results, next_token = cache.get_or_set(
+        feed_cache_key("api:v1:uploads", filters, f"{token if cursor else ''}:{','.join(stable)}:{limit}"),
+        lambda: upload_rows_page(feed_queryset(filters), stable, cursor, limit, filters["sort"]),
+        FEED_CACHE_TIMEOUT,
+    )
+    body = json.dumps({"results": with_live_fields(results, fields), "next": next_token or None}).encode()
+    return json_response(request, body, body_etag(body))
+
+
+@require_http_methods(["GET", "HEAD"])
+@api_auth
+def api_v1_upload(request, pk):
+    try:
+        fields = parse_fields(request.GET.get("fields", ""), DETAIL_FIELDS)
+    except ValueError as exc:
+        return error_response(400, str(exc))
+    data = upload_detail(request.user, pk, fields)
+    if data is None:
+        return error_response(404, "Note not found.")
+    body = json.dumps(data).encode()
+    return json_response(request, body, body_etag(body))
+
+
+@csrf_exempt
+@require_POST
+def api_v1_token(request):
+    # No session is involved, so there is nothing for CSRF to protect
+    user = authenticate(request, username=request.POST.get("username", "").strip(), password=request.POST.get("password", ""))
+    if user is None:
+        return error_response(401, "Invalid username or password.")
+    return JsonResponse({"token": issue_token(user), "expires_in": settings.API_TOKEN_MAX_AGE})
 
 
 # -------------------------
@@ -154,9 +349,6 @@ def api_subjects(request):
 # -------------------------
 @login_required
 def upload_note(request):
-    branches = Branch.objects.all().order_by("name")
-    semesters = Semester.objects.all().order_by("number")
-
     if request.method == "POST":
         branch_id = request.POST.get("branch")
         semester_id = request.POST.get("semester")
@@ -173,25 +365,99 @@ def upload_note(request):
 
         subject = get_object_or_404(Subject, id=subject_id)
 
-        Upload.objects.create(
-            uploader=request.user,
-            subject=subject,
-            title=title,
-            description=description,
-            file=file,
-            upload_type=upload_type,
-            status="UNVERIFIED",
-        )
+        try:
+            check_file_size(file.size)
+            check_file_header(file.name, next(file.chunks(), b""))
+        except UploadRejected as e:
+            messages.error(request, str(e))
+            return redirect("upload_note")
+        file.seek(0)
 
-        add_points(request.user, "Uploaded note", 10)
+        create_upload(request.user, subject, title, description, file, upload_type)
         messages.success(request, "Uploaded successfully! (Unverified)")
         return redirect("my_uploads")
 
+    catalog = get_catalog()
     return render(
         request,
         "core/upload.html",
-        {"branches": branches, "semesters": semesters, "user_points": get_user_points(request.user)},
+        {
+            "branches": catalog.branches,
+            "semesters": catalog.semesters,
+            "catalog_version": catalog.etag,
+            "chunk_size": settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        },
+    )
+
+
+# -------------------------
+# CHUNKED UPLOAD API
+# -------------------------
+def _chunked_state(chunked):
+    return {"id": str(chunked.pk), "offset": chunked.offset, "size": chunked.size}
+
+
+@require_POST
+@login_required
+def api_chunked_start(request):
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        return JsonResponse({"error": "size is required."}, status=400)
+
+    try:
+        chunked = start_chunked_upload(
+            request.user,
+            request.POST.get("subject", ""),
+            request.POST.get("title", "").strip(),
+            request.POST.get("description", "").strip(),
+            request.POST.get("upload_type", ""),
+            request.POST.get("filename", ""),
+            size,
+        )
+    except UploadRejected as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    data = _chunked_state(chunked)
+    data["chunk_size"] = settings.CHUNKED_UPLOAD_CHUNK_SIZE
+    return JsonResponse(data, status=201)
+
+
+@require_http_methods(["GET", "PUT", "DELETE"])
+@login_required
+def api_chunked_upload(request, upload_id):
+    chunked = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+    if request.method == "DELETE":
+        discard_chunked_upload(chunked)
+        return HttpResponse(status=204)
+
+    if request.method == "PUT":
+        try:
+            start, end = parse_content_range(request.headers.get("Content-Range"), chunked.size)
+            chunked.offset = write_chunk(chunked, request, start, end)
+        except UploadRejected as e:
+            chunked.refresh_from_db(fields=["offset"])
+            data = _chunked_state(chunked)
+            data["error"] = str(e)
+            return JsonResponse(data, status=e.status)
+
+    return JsonResponse(_chunked_state(chunked))
+
+
+@require_POST
+@login_required
+def api_chunked_finish(request, upload_id):
+    chunked = get_object_or_404(
+        ChunkedUpload.objects.select_related("user", "subject"), pk=upload_id, user=request.user
     )
+    try:
+        upload, sha256 = finish_chunked_upload(chunked, request.POST.get("sha256", ""))
+    except UploadRejected as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    messages.success(request, "Uploaded successfully! (Unverified)")
+    return JsonResponse({"id": upload.id, "sha256": sha256, "redirect": reverse("my_uploads")}, status=201)
 
 
 # -------------------------
@@ -199,32 +465,85 @@ def upload_note(request):
 # -------------------------
 @login_required
 def view_note(request, pk):
-    note = get_object_or_404(Upload, pk=pk)
+    note = get_object_or_404(Upload.objects.select_related("subject", "branch", "semester", "blob"), pk=pk)
+    if not _can_open(request.user, note):
+        raise Http404("Note not found")
 
-    avg_rating = Rating.objects.filter(upload=note).aggregate(avg=Avg("stars"))["avg"]
-    rating_count = Rating.objects.filter(upload=note).count()
-    my_rating = Rating.objects.filter(upload=note, user=request.user).first()
+    my_rating = Rating.objects.filter(upload=note, user=request.user).values_list("stars", flat=True).first()
+    if _counts_as_hit(request):
+        record_hit("view", note.pk, request.user.id)
 
     return render(
         request,
         "core/view_note.html",
         {
             "note": note,
-            "avg_rating": avg_rating,
-            "rating_count": rating_count,
+            "avg_rating": note.avg_rating,
+            "rating_count": note.rating_count,
             "my_rating": my_rating,
-            "user_points": get_user_points(request.user),
+            # The first-page image stands in for the PDF until it is asked for
+            "show_full": request.GET.get("full") == "1",
         },
     )
 
 
+def _counts_as_hit(request):
+    # Browser prefetches and HEAD checks aren't anyone reading the note
+    purpose = request.headers.get("Sec-Purpose", "") or request.headers.get("Purpose", "")
+    return request.method == "GET" and "prefetch" not in purpose
+
+
+# -------------------------
+# NOTE FILE (open / download)
+# -------------------------
+def _can_open(user, upload):
+    return upload.status not in ("REMOVED", "HIDDEN") or user.is_staff or upload.uploader_id == user.id
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def note_file(request, pk):
+    upload = get_object_or_404(Upload, pk=pk)
+    if not _can_open(request.user, upload):
+        raise Http404("Note not found")
+    return upload_file_response(request, upload)
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def note_download(request, pk):
+    upload = get_object_or_404(Upload, pk=pk)
+    if not _can_open(request.user, upload):
+        raise Http404("Note not found")
+    if upload.status != "VERIFIED" and not request.user.is_staff:
+        return HttpResponse("Only verified notes can be downloaded.", status=403)
+    if _counts_as_hit(request):
+        record_hit("download", upload.pk, request.user.id)
+    return upload_file_response(request, upload, as_attachment=True)
+
+
+@require_http_methods(["GET", "HEAD"])
+def preview_image(request, name):
+    # Previews are public and named by content; the originals next to them are not
+    if not PREVIEW_NAME.match(name):
+        raise Http404("Preview not found")
+    return file_response(request, name, os.path.basename(name), etag=os.path.basename(name), immutable=True)
+
+
+@require_http_methods(["GET", "HEAD"])
+def signed_file(request, token):
+    # The signature is the permission check; no session or database needed
+    payload = load_signed_file(token)
+    return file_response(request, payload["n"], payload["f"], payload["a"], payload["e"], payload["m"])
+
+
 # -------------------------
 # RATE NOTE
 # -------------------------
 @require_POST
 @login_required
 def rate_note(request, pk):
-    note = get_object_or_404(Upload, pk=pk)
+    note = get_object_or_404(Upload.objects.only("id"), pk=pk)
 
     stars = request.POST.get("stars")
     try:
@@ -237,11 +556,7 @@ def rate_note(request, pk):
         messages.error(request, "Rating must be 1 to 5.")
         return redirect("view_note", pk=pk)
 
-    Rating.objects.update_or_create(
-        user=request.user,
-        upload=note,
-        defaults={"stars": stars},
-    )
+    rate_upload(request.user, note.pk, stars)
 
     messages.success(request, "Rating saved.")
     return redirect("view_note", pk=pk)
@@ -253,7 +568,7 @@ def rate_note(request, pk):
 @require_POST
 @login_required
 def report_note(request, pk):
-    note = get_object_or_404(Upload, pk=pk)
+    note = get_object_or_404(Upload.objects.only("id"), pk=pk)
     reason = request.POST.get("reason", "").strip()
 
     valid_reasons = ["SPAM", "WRONG", "COPYRIGHT", "VULGAR"]
@@ -262,13 +577,10 @@ def report_note(request, pk):
         messages.error(request, "Invalid report reason.")
         return redirect("view_note", pk=pk)
 
-    Report.objects.get_or_create(
-        reporter=request.user,
-        upload=note,
-        defaults={"reason": reason},
-    )
-
-    messages.success(request, "Report submitted.")
+    if report_upload(request.user, note.pk, reason):
+        messages.success(request, "Report submitted. This note is hidden until a moderator reviews it.")
+    else:
+        messages.success(request, "Report submitted.")
     return redirect("view_note", pk=pk)
 
 
@@ -277,11 +589,11 @@ def report_note(request, pk):
 # -------------------------
 @login_required
 def my_uploads(request):
-    uploads = Upload.objects.filter(uploader=request.user).order_by("-created_at")
+    uploads = Upload.objects.filter(uploader=request.user).select_related("subject").order_by("-created_at")
     return render(
         request,
         "core/my_uploads.html",
-        {"uploads": uploads, "user_points": get_user_points(request.user)},
+        {"uploads": uploads},
     )
 
 
@@ -303,15 +615,22 @@ def delete_upload(request, pk):
 # -------------------------
 @login_required
 def leaderboard(request):
-    leaderboard_data = (
-        PointsLog.objects.values("user__username")
-        .annotate(points=Sum("points_change"))
-        .order_by("-points")
-    )
+    cursor = decode_cursor(request.GET.get("after"), 3)
+    try:
+        cursor = tuple(int(v) for v in cursor) if cursor else None
+    except (TypeError, ValueError):
+        cursor = None
+
+    rows, next_cursor = leaderboard_page(cursor) if cursor else leaderboard_first_page()
     return render(
         request,
         "core/leaderboard.html",
-        {"leaderboard_data": leaderboard_data, "user_points": get_user_points(request.user)},
+        {
+            "leaderboard_data": rows,
+            "next_cursor": encode_cursor(next_cursor) if next_cursor else "",
+            "is_first_page": cursor is None,
+            "my_neighbours": rank_neighbours(request.user),
+        },
     )
 
 
@@ -322,34 +641,154 @@ def is_admin(user):
     return user.is_staff
 
 
+ADMIN_UPLOAD_SORTS = {
+    "newest": ["-created_at"],
+    "rating": [avg_rating_expression().desc(nulls_last=True), "-rating_count"],
+    "reports": ["-report_count", "-created_at"],
+}
+
+
+ADMIN_UPLOADS_PAGE_SIZE = 50
+
+
 @user_passes_test(is_admin)
 def admin_uploads(request):
-    uploads = Upload.objects.select_related("subject", "uploader").order_by("-created_at")
-    return render(request, "core/admin_uploads.html", {"uploads": uploads, "user_points": get_user_points(request.user)})
+    sort = request.GET.get("sort", "newest")
+    if sort not in ADMIN_UPLOAD_SORTS:
+        sort = "newest"
+
+    page = _page_number(request)
+    offset = (page - 1) * ADMIN_UPLOADS_PAGE_SIZE
+    uploads = list(
+        Upload.objects.select_related("subject", "branch", "semester", "uploader")
+        .order_by(*ADMIN_UPLOAD_SORTS[sort])[offset : offset + ADMIN_UPLOADS_PAGE_SIZE + 1]
+    )
+    has_next = len(uploads) > ADMIN_UPLOADS_PAGE_SIZE
+    return render(
+        request,
+        "core/admin_uploads.html",
+        {
+            "uploads": uploads[:ADMIN_UPLOADS_PAGE_SIZE],
+            "selected_sort": sort,
+            "page": page,
+            "has_next": has_next,
+        },
+    )
 
 
+@user_passes_test(is_admin)
+def moderation_queue(request):
+    cursor = parse_moderation_cursor(decode_cursor(request.GET.get("after"), 3))
+    uploads, next_cursor = moderation_page(cursor)
+    return render(
+        request,
+        "core/admin_moderation.html",
+        {
+            "uploads": uploads,
+            "next_cursor": encode_cursor(next_cursor) if next_cursor else "",
+            "is_first_page": cursor is None,
+        },
+    )
+
+
+def _moderation_redirect(request):
+    next_url = request.POST.get("next", "")
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect("admin_uploads")
+
+
+@require_POST
+@user_passes_test(is_admin)
+def moderate_uploads(request):
+    status = MODERATION_ACTIONS.get(request.POST.get("action"))
+    ids = request.POST.getlist("ids")
+    if status is None or not ids:
+        messages.error(request, "Select some uploads and an action.")
+        return _moderation_redirect(request)
+
+    reviewed, changed = set_status(ids, status)
+    messages.success(request, f"{reviewed} upload(s) reviewed, {changed} newly marked {status.lower()}.")
+    return _moderation_redirect(request)
+
+
+@require_POST
 @user_passes_test(is_admin)
 def verify_upload(request, pk):
-    upload = get_object_or_404(Upload, pk=pk)
-    upload.status = "VERIFIED"
-    upload.save()
+    get_object_or_404(Upload.objects.only("id"), pk=pk)
+    set_status([pk], "VERIFIED")
     messages.success(request, "Upload verified.")
-    return redirect("admin_uploads")
+    return _moderation_redirect(request)
 
 
+@require_POST
 @user_passes_test(is_admin)
 def remove_upload(request, pk):
-    upload = get_object_or_404(Upload, pk=pk)
-    upload.status = "REMOVED"
-    upload.save()
+    get_object_or_404(Upload.objects.only("id"), pk=pk)
+    set_status([pk], "REMOVED")
     messages.success(request, "Upload removed.")
-    return redirect("admin_uploads")
+    return _moderation_redirect(request)
+
+
+REPORT_REASONS = dict(Report.REASON_CHOICES)
 
 
 @user_passes_test(is_admin)
 def admin_reports(request):
-    reports = Report.objects.select_related("upload", "reporter").order_by("-created_at")
-    return render(request, "core/admin_reports.html", {"reports": reports, "user_points": get_user_points(request.user)})
+    reason = request.GET.get("reason", "")
+    if reason not in REPORT_REASONS:
+        reason = ""
+    status = request.GET.get("status", "")
+    if status not in dict(Upload.STATUS_CHOICES):
+        status = ""
+
+    page = _page_number(request)
+    offset = (page - 1) * TRIAGE_PAGE_SIZE
+    uploads = list(report_triage(reason, status)[offset : offset + TRIAGE_PAGE_SIZE + 1])
+    has_next = len(uploads) > TRIAGE_PAGE_SIZE
+    uploads = uploads[:TRIAGE_PAGE_SIZE]
+    for u in uploads:
+        u.reason_counts = [
+            (code, label, getattr(u, reason_field(code))) for code, label in Report.REASON_CHOICES
+        ]
+
+    params = request.GET.copy()
+    params.pop("page", None)
+    return render(
+        request,
+        "core/admin_reports.html",
+        {
+            "uploads": uploads,
+            "selected_reason": reason,
+            "selected_status": status,
+            "page": page,
+            "has_next": has_next,
+            "filter_query": params.urlencode(),
+        },
+    )
+
+
+@never_cache
+@require_http_methods(["GET"])
+@user_passes_test(is_admin)
+def export_data(request, table):
+    fmt = request.GET.get("format", "csv")
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export")
+    response = StreamingHttpResponse(export_chunks(table, fmt), content_type=EXPORT_FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{table}.{fmt}"'
+    return response
+
+
+@never_cache
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    )
+    if not authorized:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics_text(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # -------------------------
@@ -357,19 +796,19 @@ def admin_reports(request):
 # -------------------------
 @login_required
 def privacy_policy(request):
-    return render(request, "core/privacy_policy.html", {"user_points": get_user_points(request.user)})
+    return render(request, "core/privacy_policy.html")
 
 
 @login_required
 def terms(request):
-    return render(request, "core/terms.html", {"user_points": get_user_points(request.user)})
+    return render(request, "core/terms.html")
 
 
 @login_required
 def disclaimer(request):
-    return render(request, "core/disclaimer.html", {"user_points": get_user_points(request.user)})
+    return render(request, "core/disclaimer.html")
 
 
 @login_required
 def contact(request):
-    return render(request, "core/contact.html", {"user_points": get_user_points(request.user)})
\ No newline at end of file
+    return render(request, "core/contact.html")
\ No newline at end of file